@@ -0,0 +1,216 @@
+import multiprocessing as mp
+import queue
+import argparse
+import time
+import os
+import numpy as np
+import random
+from tetris_env import TetrisEnv
+
+def _actor(transitions, weights_queue, step_counter, stop, hidden, epsilon, epsilon_min, epsilon_decay,
+           send_every, seed, client=None, numpy_policy=False):
+    '''
+    Plays TetrisEnv with a local copy of the Q-network and an epsilon-greedy schedule, sending
+    transitions to the learner in bit-packed blocks of `send_every` and picking up new weights
+    whenever the learner publishes them. With an InferenceClient, greedy actions come from the
+    learner's inference server instead and the actor never loads TensorFlow; with numpy_policy
+    the local copy is a policy_export.NumpyPolicy, which does not need TensorFlow either.
+    '''
+    random.seed(seed)
+    np.random.seed(seed)
+    env = TetrisEnv()
+    if numpy_policy and client is None:
+        from policy_export import NumpyPolicy
+        model = NumpyPolicy(weights_queue.get())
+        q_values = model.q_values
+    elif client is None:
+        import tensorflow as tf
+        from model import build_model
+        state_size = int(np.prod(env.get_state().shape))
+        model = build_model(state_size, env.action_space, hidden)
+        q_values = tf.function(lambda states: model(states, training=False))
+        model.set_weights(weights_queue.get())
+    block = []
+    steps = 0
+    while not stop.is_set():
+        state = env.reset().reshape(-1)
+        done = False
+        while not done and not stop.is_set():
+            if np.random.rand() < epsilon:
+                action = np.random.randint(0, env.action_space)
+            elif client is not None:
+                action = client.act(state)
+            else:
+                action = int(np.argmax(q_values(state.reshape(1, -1))[0]))
+            next_state, reward, done = env.step(action)
+            next_state = next_state.reshape(-1)
+            block.append((np.packbits(state != 0), action, reward, np.packbits(next_state != 0), done))
+            state = next_state
+            steps += 1
+            if len(block) >= send_every:
+                packed, actions, rewards, next_packed, dones = zip(*block)
+                transitions.put((np.array(packed), np.array(actions), np.array(rewards, dtype=np.float32),
+                                 np.array(next_packed), np.array(dones)))
+                block = []
+                with step_counter.get_lock():
+                    step_counter.value += steps
+                steps = 0
+                if client is None:
+                    try:
+                        model.set_weights(weights_queue.get_nowait())
+                    except queue.Empty:
+                        pass
+        if epsilon > epsilon_min:
+            epsilon = max(epsilon_min, epsilon * epsilon_decay)
+    transitions.cancel_join_thread()  # Unsent transitions are dropped on shutdown
+
+class ActorLearner:
+    '''
+    Runs `num_actors` actor processes that each play TetrisEnv with a local policy copy and stream
+    transitions through a queue into the learner's replay buffer. The learner (this process) trains
+    continuously with a DQNTrainer and broadcasts its weights to the actors every `broadcast_every` updates.
+    Actor i explores down to epsilon_min ** (1 + i / num_actors), so actors cover a range of exploration rates.
+    With `inference_server=True` the actors hold no network: their greedy actions are batched through an
+    InferenceServer thread running the learner's live model, and no weights are broadcast. With
+    `numpy_actors=True` each actor runs the broadcast weights through a NumPy forward pass instead of Keras.
+    Between updates the learner ingests at most `drain_blocks` queued blocks, so it keeps training while
+    actors produce faster than it can consume.
+    '''
+    def __init__(self, num_actors=None, broadcast_every=100, send_every=64, epsilon=1.0, epsilon_min=0.1,
+                 epsilon_decay=0.995, seed=0, inference_server=False, max_batch_size=None, max_wait=0.002,
+                 numpy_actors=False, drain_blocks=4, **trainer_kwargs):
+        from model import DQNTrainer
+        self.num_actors = num_actors or max(1, (os.cpu_count() or 2) - 1)
+        self.broadcast_every = broadcast_every
+        self.drain_blocks = drain_blocks
+        self.trainer = DQNTrainer(**trainer_kwargs)
+        self.hidden = tuple(trainer_kwargs.get('hidden', (128, 128)))
+        ctx = mp.get_context('spawn')  # TensorFlow is not fork-safe
+        self.transitions = ctx.Queue(maxsize=1024)
+        self.weights_queues = [ctx.Queue(maxsize=1) for _ in range(self.num_actors)]
+        self.step_counter = ctx.Value('q', 0)
+        self.stop = ctx.Event()
+        self.server = None
+        if inference_server:
+            from inference_server import InferenceServer
+            self.server = InferenceServer(self.trainer.model, self.num_actors, max_batch_size or self.num_actors,
+                                          max_wait, context=ctx)
+        self.actors = [ctx.Process(target=_actor, daemon=True, args=(
+            self.transitions, self.weights_queues[i], self.step_counter, self.stop, self.hidden, epsilon,
+            epsilon_min ** (1 + i / self.num_actors), epsilon_decay, send_every, seed + i,
+            self.server.client(i) if self.server else None, numpy_actors))
+            for i in range(self.num_actors)]
+
+    def broadcast(self):
+        '''
+        Replaces whatever weights each actor has not yet picked up with the current ones.
+        '''
+        weights = self.trainer.model.get_weights()
+        for weights_queue in self.weights_queues:
+            try:
+                weights_queue.get_nowait()
+            except queue.Empty:
+                pass
+            weights_queue.put(weights)
+
+    def drain(self, block=False, max_blocks=None):
+        '''
+        Moves queued transition blocks, at most `max_blocks` of them, into the replay buffer.
+        Returns the number of transitions added.
+        '''
+        added = 0
+        blocks = 0
+        while max_blocks is None or blocks < max_blocks:
+            try:
+                packed, actions, rewards, next_packed, dones = self.transitions.get(block=block, timeout=1 if block else None)
+            except queue.Empty:
+                break
+            self.trainer.memory.add_packed_batch(packed, actions, rewards, next_packed, dones)
+            added += len(actions)
+            blocks += 1
+            block = False
+        return added
+
+    def run(self, num_updates, log_every=10.0):
+        '''
+        Trains for `num_updates` learner updates, printing actor steps/sec and learner updates/sec every `log_every` seconds.
+        '''
+        if self.server is not None:
+            self.server.start()
+        else:
+            self.broadcast()
+        for actor in self.actors:
+            actor.start()
+        trainer = self.trainer
+        start = last_log = time.perf_counter()
+        last_steps = last_updates = 0
+        try:
+            while trainer.updates < num_updates:
+                self.drain(block=len(trainer.memory) <= trainer.batch_size, max_blocks=self.drain_blocks)
+                if len(trainer.memory) > trainer.batch_size:
+                    trainer.train_on_batch()
+                    if self.server is None and trainer.updates % self.broadcast_every == 0:
+                        self.broadcast()
+                now = time.perf_counter()
+                if now - last_log >= log_every:
+                    if not any(actor.is_alive() for actor in self.actors):
+                        raise RuntimeError("All actor processes have exited")
+                    steps = self.step_counter.value
+                    print(f"{now - start:.0f}s: actor steps/sec {(steps - last_steps) / (now - last_log):.0f}, "
+                          f"learner updates/sec {(trainer.updates - last_updates) / (now - last_log):.1f}, "
+                          f"replay {len(trainer.memory)}" + self.server_summary())
+                    last_log, last_steps, last_updates = now, steps, trainer.updates
+        finally:
+            self.close()
+
+    def server_summary(self):
+        if self.server is None:
+            return ""
+        stats = self.server.stats()
+        return (f", inference batch {stats['mean_batch_size']:.1f} ({stats['batch_fill']:.0%} full), "
+                f"wait {stats['mean_queue_wait_ms']:.2f} ms, forward {stats['mean_compute_ms']:.2f} ms")
+
+    def close(self):
+        self.stop.set()
+        while any(actor.is_alive() for actor in self.actors):
+            self.drain()  # Actors blocked on a full queue need it emptied to exit
+            for actor in self.actors:
+                actor.join(timeout=0.1)
+        if self.server is not None:
+            self.server.stop()
+            self.server.requests.cancel_join_thread()
+            for replies in self.server.replies:
+                replies.cancel_join_thread()
+        # Weights the actors never picked up would otherwise block interpreter exit
+        for weights_queue in self.weights_queues:
+            weights_queue.cancel_join_thread()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asynchronous actor-learner DQN training on TetrisEnv.")
+    parser.add_argument('--actors', type=int, default=None, help="Number of actor processes (default: cores - 1)")
+    parser.add_argument('--updates', type=int, default=100000)
+    parser.add_argument('--broadcast-every', type=int, default=100, help="Learner updates between weight broadcasts")
+    parser.add_argument('--send-every', type=int, default=64, help="Transitions per actor -> learner message")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--memory-size', type=int, default=1000000)
+    parser.add_argument('--target-update', type=int, default=1000)
+    parser.add_argument('--prioritized', action='store_true')
+    parser.add_argument('--inference-server', action='store_true', help="Batch actor action selection in the learner instead of per-actor networks")
+    parser.add_argument('--max-batch-size', type=int, default=None, help="Inference batch cap (default: number of actors)")
+    parser.add_argument('--numpy-actors', action='store_true', help="Actors run a NumPy copy of the network and never import TensorFlow")
+    parser.add_argument('--max-wait', type=float, default=0.002, help="Seconds the inference server waits to fill a batch")
+    parser.add_argument('--drain-blocks', type=int, default=4, help="Most actor blocks ingested between learner updates")
+    parser.add_argument('--log-every', type=float, default=10.0, help="Seconds between throughput reports")
+    parser.add_argument('--save', default=None)
+    args = parser.parse_args(argv)
+    runner = ActorLearner(num_actors=args.actors, broadcast_every=args.broadcast_every, send_every=args.send_every,
+                          batch_size=args.batch_size, memory_size=args.memory_size,
+                          target_update=args.target_update, prioritized=args.prioritized,
+                          inference_server=args.inference_server, max_batch_size=args.max_batch_size, max_wait=args.max_wait,
+                          numpy_actors=args.numpy_actors, drain_blocks=args.drain_blocks)
+    runner.run(args.updates, log_every=args.log_every)
+    if args.save:
+        runner.trainer.model.save(args.save)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import copy
+import numpy as np
+from tetris_env import TetrisEnv
+from bitboard_env import BitboardTetrisEnv
+from vec_env import TetrisVecEnv
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+def _scripted_policy():
+    '''
+    Deterministic action cycle: shuffle left, rotate, shuffle right, then soft drop.
+    '''
+    pattern = [1, 1, 3, 2, 2, 4, 4, 0]
+    i = 0
+    while True:
+        yield pattern[i % len(pattern)]
+        i += 1
+
+def bench_env_steps(env_cls, steps, policy):
+    random.seed(0)
+    env = env_cls()
+    actions = _scripted_policy()
+    start = time.perf_counter()
+    for _ in range(steps):
+        action = random.randrange(5) if policy == 'random' else next(actions)
+        _, _, done = env.step(action)
+        if done:
+            env.reset()
+    return _rate(steps, time.perf_counter() - start)
+
+def bench_vec_env(n, steps):
+    env = TetrisVecEnv(n, seed=0)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 5, (steps, n))
+    start = time.perf_counter()
+    for i in range(steps):
+        env.step(actions[i])
+    return _rate(n * steps, time.perf_counter() - start)
+
+def bench_get_state(calls):
+    random.seed(0)
+    env = TetrisEnv()
+    for _ in range(50):
+        env.step(random.randrange(5))
+    start = time.perf_counter()
+    for _ in range(calls):
+        env.get_state()
+    return (time.perf_counter() - start) / calls
+
+def bench_snapshot_restore(calls):
+    '''
+    One get_snapshot() plus one restore() of a mid-game env, as a tree search does per branch.
+    '''
+    random.seed(0)
+    env = TetrisEnv()
+    for _ in range(50):
+        env.step(random.randrange(5))
+    start = time.perf_counter()
+    for _ in range(calls):
+        env.restore(env.get_snapshot(rng=False))
+    return (time.perf_counter() - start) / calls
+
+def _line_clear_env(lines):
+    '''
+    Env with `lines` bottom rows full except column 0 and a vertical I piece resting in that gap.
+    '''
+    random.seed(0)
+    env = TetrisEnv()
+    for y in range(env.grid_height - 4, env.grid_height):
+        env.locked_grid[y] = [x > 0 and y >= env.grid_height - lines for x in range(env.grid_width)]
+        if y < env.grid_height - lines:
+            env.locked_grid[y][env.grid_width - 1] = True  # Keep partial rows so every case locks the same piece
+    env.rebuild_obs()
+    env.rebuild_features()
+    piece = env.Piece('I', env.SHAPES)
+    piece.rotation = 1
+    piece.x = -2
+    piece.y = env.grid_height - 4
+    env.current_piece = piece
+    return env
+
+def bench_line_clear(lines, repeats):
+    template = _line_clear_env(lines)
+    total = 0.0
+    for _ in range(repeats):
+        env = copy.deepcopy(template)
+        start = time.perf_counter()
+        _, reward, _ = env.lock_piece()
+        total += time.perf_counter() - start
+    assert reward == TetrisEnv.reward_dict[lines]
+    return total / repeats
+
+def bench_tetris_line_check(repeats):
+    import tetris
+    game = tetris.Game(seed=0)
+    total = 0.0
+    for i in range(repeats):
+        game.locked_grid = [[y >= 16 or (x + y + i) % 3 == 0 for x in range(10)] for y in range(20)]
+        game.color_grid = [[(255, 0, 0) if cell else None for cell in row] for row in game.locked_grid]
+        start = time.perf_counter()
+        game.line_check()
+        total += time.perf_counter() - start
+    return total / repeats
+
+def bench_tetris_rotate(repeats):
+    '''
+    Rotations against a crowded board so most of them go through the wall-kick search.
+    '''
+    import tetris
+    locked_grid = [[x in (0, 1, 8, 9) and y > 5 for x in range(10)] for y in range(20)]
+    keys = list(TetrisEnv.SHAPES)
+    total = 0.0
+    for i in range(repeats):
+        piece = tetris.Piece(keys[i % len(keys)])
+        piece.x = (i % 3) * 3
+        piece.y = 10
+        start = time.perf_counter()
+        piece.rotate(locked_grid)
+        total += time.perf_counter() - start
+    return total / repeats
+
+def bench_render(frames, dirty_rects=False):
+    '''
+    Frame draw time of the pygame front end on the SDL dummy video driver, either full redraws or
+    Graphics.render in dirty-rect mode.
+    '''
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame as pg
+    import tetris
+    pg.init()
+    graphics = tetris.Graphics(dirty_rects=dirty_rects)
+    color_grid = [[(255, 0, 0) if y > 12 and (x + y) % 4 else None for x in range(10)] for y in range(20)]
+    piece = tetris.Piece('T')
+    next_piece = tetris.Piece('L')
+    start = time.perf_counter()
+    for i in range(frames):
+        piece.y = i % 12
+        if dirty_rects:
+            graphics.render(piece, color_grid, next_piece, i // 10)
+            continue
+        graphics.background()
+        graphics.draw_piece(piece)
+        graphics.draw_locked(color_grid)
+        graphics.draw_next_piece(next_piece)
+        graphics.draw_score(i // 10)
+        pg.display.flip()
+    elapsed = time.perf_counter() - start
+    pg.quit()
+    return elapsed / frames
+
+def bench_tetris_headless(ticks):
+    '''
+    Fixed-timestep game ticks per second with no window and no input, restarting on game over.
+    '''
+    import tetris
+    game = tetris.Game(seed=0)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if game.game_over:
+            game = tetris.Game(seed=game.ticks)
+        game.update()
+    return _rate(ticks, time.perf_counter() - start)
+
+def bench_planner(moves, depth=2):
+    '''
+    Beam-search nodes expanded and scored per second with the heuristic evaluator.
+    '''
+    from planner import BeamPlanner
+    random.seed(0)
+    env = TetrisEnv(action_mode='placement')
+    planner = BeamPlanner(depth=depth)
+    for _ in range(moves):
+        action = planner.plan(env)
+        if action is None or env.step(action)[2]:
+            env.reset()
+    return planner.stats()['nodes_per_sec']
+
+def bench_train(updates, batch_size=32):
+    from model import DQNTrainer
+    trainer = DQNTrainer(batch_size=batch_size, memory_size=10000)
+    rng = np.random.default_rng(0)
+    for _ in range(1000):
+        state = (rng.random(trainer.state_size) < 0.2).astype(np.float32)
+        next_state = (rng.random(trainer.state_size) < 0.2).astype(np.float32)
+        trainer.remember(state, int(rng.integers(0, 5)), float(rng.choice([0, 40])), next_state, bool(rng.random() < 0.01))
+    trainer.train_on_batch()  # Trace the compiled step outside the timed loop
+    start = time.perf_counter()
+    for _ in range(updates):
+        trainer.train_on_batch()
+    return _rate(updates, time.perf_counter() - start)
+
+def machine_info():
+    info = {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    try:
+        import pygame
+        info['pygame'] = pygame.version.ver
+    except ImportError:
+        pass
+    return info
+
+def benchmarks(scale):
+    '''
+    Returns {name: (function, unit, higher_is_better)}; `scale` multiplies the iteration counts.
+    '''
+    n = lambda count: max(1, int(count * scale))
+    suite = {
+        'env_step_random': (lambda: bench_env_steps(TetrisEnv, n(20000), 'random'), 'steps/s', True),
+        'env_step_scripted': (lambda: bench_env_steps(TetrisEnv, n(20000), 'scripted'), 'steps/s', True),
+        'bitboard_env_step_random': (lambda: bench_env_steps(BitboardTetrisEnv, n(20000), 'random'), 'steps/s', True),
+        'vec_env_step_random_1024': (lambda: bench_vec_env(1024, n(200)), 'steps/s', True),
+        'get_state': (lambda: bench_get_state(n(20000)), 's/call', False),
+        'env_snapshot_restore': (lambda: bench_snapshot_restore(n(20000)), 's/call', False),
+        'tetris_line_check': (lambda: bench_tetris_line_check(n(2000)), 's/call', False),
+        'tetris_rotate_wall_kick': (lambda: bench_tetris_rotate(n(20000)), 's/call', False),
+        'tetris_headless_ticks': (lambda: bench_tetris_headless(n(50000)), 'ticks/s', True),
+        'render_frame': (lambda: bench_render(n(200)), 's/frame', False),
+        'render_frame_dirty': (lambda: bench_render(n(200), dirty_rects=True), 's/frame', False),
+        'planner_depth2_nodes': (lambda: bench_planner(n(100)), 'nodes/s', True),
+        'dqn_train_updates': (lambda: bench_train(n(200)), 'updates/s', True),
+    }
+    for lines in range(5):
+        suite[f'line_clear_{lines}'] = ((lambda lines=lines: bench_line_clear(lines, n(2000))), 's/call', False)
+    return suite
+
+def run(only=None, scale=1.0, repeats=5):
+    '''
+    Runs every benchmark `repeats` times. The reported value is the median; spread is half the range
+    of the runs relative to the median, an estimate of the run-to-run noise on this machine.
+    '''
+    results = {'machine': machine_info(), 'repeats': repeats, 'results': {}}
+    for name, (function, unit, higher_is_better) in benchmarks(scale).items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        try:
+            samples = [function() for _ in range(repeats)]
+        except ImportError as error:
+            print(f"{name:28s} skipped ({error})")
+            continue
+        value = float(np.median(samples))
+        spread = (max(samples) - min(samples)) / 2 / value if value else 0.0
+        results['results'][name] = {'value': value, 'spread': spread, 'samples': samples, 'unit': unit,
+                                    'higher_is_better': higher_is_better}
+        print(f"{name:28s} {value:14.6g} {unit:10s} +/-{spread:6.1%}")
+    return results
+
+def compare(baseline, current, threshold):
+    '''
+    Prints the relative change of every benchmark present in both files. Returns the names of those
+    that got worse by more than `threshold` (a fraction) and by more than the noise: the sum of the
+    two runs' spreads (0 for results written before spreads were recorded).
+    '''
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['value']
+        new = result['value']
+        change = (new - old) / old if result['higher_is_better'] else (old - new) / old
+        noise = baseline['results'][name].get('spread', 0.0) + result.get('spread', 0.0)
+        flag = ''
+        if change < -threshold and change < -noise:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        elif change < -threshold:
+            flag = '  (within noise)'
+        print(f"{name:28s} {old:12.6g} -> {new:12.6g} {result['unit']:10s} {change:+7.1%} (noise {noise:.1%}){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for the env, game logic, rendering and training.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Run the benchmarks and write JSON results")
+    run_parser.add_argument('--out', default='benchmark_results.json')
+    run_parser.add_argument('--only', nargs='+', default=None, help="Only run benchmarks whose name starts with one of these")
+    run_parser.add_argument('--scale', type=float, default=1.0, help="Multiplier on iteration counts")
+    run_parser.add_argument('--repeats', type=int, default=5, help="Runs per benchmark; the median is reported")
+    compare_parser = commands.add_parser('compare', help="Compare results against a stored baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="Allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(args.only, args.scale, args.repeats)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
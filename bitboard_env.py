@@ -0,0 +1,140 @@
+import numpy as np
+from metrics import metrics
+from tetris_env import TetrisEnv
+
+class BitboardTetrisEnv(TetrisEnv):
+    '''
+    Drop-in replacement for TetrisEnv that stores each row of the board as an int bitmask
+    (bit x set = column x locked). Collision, bounds checks, locking and line clears are a
+    handful of integer operations against a precomputed (shape, rotation, x) mask table.
+    reset(), step() and get_state() return exactly what TetrisEnv returns for the same
+    sequence of random draws.
+    '''
+    def __init__(self, obs_layout=None, seed=None, pieces='uniform'):
+        self.grid_width = 10
+        self.grid_height = 20
+        self.full_row = (1 << self.grid_width) - 1
+        # Row bitmask -> (10,) float32 row of the observation grid
+        self._row_cells = ((np.arange(1 << self.grid_width)[:, None] >> np.arange(self.grid_width)) & 1).astype(np.float32)
+        super().__init__(obs_layout=obs_layout, seed=seed, pieces=pieces)
+
+    def _build_tables(self):
+        '''
+        Precomputes, for every (shape, rotation, x) that fits horizontally, the row masks of the
+        piece relative to its y and the range of y values that keep it inside the grid.
+        '''
+        self.masks = {}
+        for key, data in self.SHAPES.items():
+            for rotation, blocks in enumerate(data['shape']):
+                min_x = min(bx for bx, by in blocks)
+                max_x = max(bx for bx, by in blocks)
+                min_y = min(by for bx, by in blocks)
+                max_y = max(by for bx, by in blocks)
+                for x in range(-min_x, self.grid_width - max_x):
+                    rows = [0] * (max_y + 1)
+                    for bx, by in blocks:
+                        rows[by] |= 1 << (bx + x)
+                    offsets = tuple((dy, mask) for dy, mask in enumerate(rows) if mask)
+                    self.masks[(key, rotation, x)] = (offsets, -min_y, self.grid_height - 1 - max_y)
+
+    def fits(self, shape_key, rotation, x, y):
+        '''
+        Returns True if the piece is inside the grid and does not overlap any locked cell.
+        '''
+        entry = self.masks.get((shape_key, rotation, x))
+        if entry is None:
+            return False
+        offsets, y_min, y_max = entry
+        if y < y_min or y > y_max:
+            return False
+        board = self.board
+        for dy, mask in offsets:
+            if board[y + dy] & mask:
+                return False
+        return True
+
+    def overlaps(self, piece):
+        '''
+        Returns True if the piece overlaps a locked cell (used for the spawn game over check).
+        '''
+        board = self.board
+        for dy, mask in self.masks[(piece.shape_key, piece.rotation, piece.x)][0]:
+            if board[piece.y + dy] & mask:
+                return True
+        return False
+
+    @property
+    def locked_grid(self):
+        return [[bool(row >> x & 1) for x in range(self.grid_width)] for row in self.board]
+
+    def set_board(self, grid):
+        self.board = (grid.astype(np.int64) @ (1 << np.arange(self.grid_width))).tolist()
+
+    def reset(self):
+        if not hasattr(self, 'masks'):
+            self._build_tables()
+        self.board = [0] * self.grid_height
+        self.score = 0
+        self.lines_cleared = 0
+        self.current_piece = self.Piece(self.rng.draw(), self.SHAPES)
+        self.next_piece = self.Piece(self.rng.draw(), self.SHAPES)
+        self.done = False
+        self.rebuild_obs()
+        self.rebuild_features()
+        return self.get_state()
+
+    def step(self, action):
+        if self.done:
+            return self.get_state(), 0, True
+
+        piece = self.current_piece
+        key = piece.shape_key
+        # Actions: 0: No-op, 1: Left, 2: Right, 3: Rotate, 4: Down,
+        if action == 1:
+            if self.fits(key, piece.rotation, piece.x - 1, piece.y):
+                piece.x -= 1
+        elif action == 2:
+            if self.fits(key, piece.rotation, piece.x + 1, piece.y):
+                piece.x += 1
+        elif action == 3:
+            rotation = (piece.rotation + 1) % len(piece.shape)
+            if self.fits(key, rotation, piece.x, piece.y):
+                piece.rotation = rotation
+        elif action == 4:
+            if self.fits(key, piece.rotation, piece.x, piece.y + 1):
+                piece.y += 1
+
+        # Move piece down by one (gravity)
+        if self.fits(key, piece.rotation, piece.x, piece.y + 1):
+            piece.y += 1
+            return self.get_state(), 0, False
+
+        # Lock the piece
+        board = self.board
+        for dy, mask in self.masks[(key, piece.rotation, piece.x)][0]:
+            board[piece.y + dy] |= mask
+        # Check for line clears
+        kept = [row for row in board if row != self.full_row]
+        lines_cleared = self.grid_height - len(kept)
+        if lines_cleared:
+            self.board = [0] * lines_cleared + kept
+            self.obs_buffer[0] = self._row_cells[self.board]
+            self.rebuild_features()
+        else:
+            for dy, mask in self.masks[(key, piece.rotation, piece.x)][0]:
+                self.obs_buffer[0, piece.y + dy] = self._row_cells[board[piece.y + dy]]
+            self.update_features(piece.get_blocks())
+        self.lines_cleared += lines_cleared
+        if metrics.enabled:
+            metrics.count('locks')
+            if lines_cleared:
+                metrics.count(f'lines_{lines_cleared}')
+        reward = self.reward_dict.get(lines_cleared, 0)
+        # Spawn next piece
+        self.current_piece = self.next_piece
+        self.next_piece = self.Piece(self.rng.draw(), self.SHAPES)
+        # Check for game over
+        if self.overlaps(self.current_piece):
+            self.done = True
+            return self.get_state(), reward, True
+        return self.get_state(), reward, False
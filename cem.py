@@ -0,0 +1,173 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from tetris_env import TetrisEnv
+from features import FEATURE_NAMES, board_features
+
+DEFAULT_FEATURES = ['aggregate_height', 'max_height', 'holes', 'bumpiness', 'row_transitions', 'column_transitions']
+
+_env = None
+
+def play_game(weights, line_weight, seed, max_pieces):
+    '''
+    Plays one placement-mode TetrisEnv game whose pieces are fixed by `seed`, placing each piece where
+    the linear score weights . features(board) + line_weight * lines is highest; all placements of a
+    piece are scored in one vectorized pass. Stops after `max_pieces`. Returns (lines cleared, pieces placed).
+    '''
+    global _env
+    if _env is None:
+        _env = TetrisEnv(action_mode='placement')
+    env = _env
+    env.rng.seed(seed)
+    env.reset()
+    pieces = 0
+    done = False
+    while not done and pieces < max_pieces:
+        actions, boards, lines = TetrisEnv.placements(np.array(env.locked_grid, dtype=bool), env.current_piece.shape_key)
+        if len(actions) == 0:
+            break
+        scores = board_features(boards) @ weights + line_weight * lines
+        _, _, done = env.step(int(actions[scores.argmax()]))
+        pieces += 1
+    return env.lines_cleared, pieces
+
+def _play(task):
+    candidate, weights, line_weight, seed, max_pieces = task
+    return (candidate,) + play_game(weights, line_weight, seed, max_pieces)
+
+class CrossEntropyOptimizer:
+    '''
+    Cross-entropy method over the weights of `features` plus a per-line weight. Each generation samples
+    `population` weight vectors from a diagonal Gaussian, plays `games` seeded games with each (the same
+    piece sequences for every candidate) on a process pool, and refits the Gaussian to the `elite_frac`
+    best by mean lines cleared, adding `noise` variance that shrinks by `noise_decay` per generation.
+    Games are cut off after `max_pieces`. With a `directory`, the distribution and history are written
+    after every generation (cem.json) along with the current mean as a weight file (weights.json),
+    and an existing cem.json is resumed.
+    '''
+    def __init__(self, features=None, population=100, elite_frac=0.1, games=10, max_pieces=1000, initial_std=10.0,
+                 noise=4.0, noise_decay=0.5, processes=None, seed=0, directory=None):
+        self.features = list(features or DEFAULT_FEATURES)
+        self.index = [FEATURE_NAMES.index(name) for name in self.features]
+        self.population = population
+        self.elite = max(1, int(round(population * elite_frac)))
+        self.games = games
+        self.max_pieces = max_pieces
+        self.noise = noise
+        self.noise_decay = noise_decay
+        self.processes = processes or os.cpu_count()
+        self.seed = seed
+        self.directory = directory
+        self.mean = np.zeros(len(self.features) + 1)
+        self.std = np.full(len(self.features) + 1, initial_std)
+        self.generation = 0
+        self.best = None
+        self.history = []
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'cem.json')
+            if os.path.exists(path):
+                self.load(path)
+
+    def weight_file(self, params):
+        return {'weights': dict(zip(self.features, map(float, params[:-1]))), 'line_weight': float(params[-1])}
+
+    def full_weights(self, params):
+        weights = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+        weights[self.index] = params[:-1]
+        return weights
+
+    def evaluate(self, candidates, pool):
+        '''
+        Mean lines cleared and pieces placed of each candidate over this generation's seeded games.
+        '''
+        seeds = [self.seed * 1000003 + self.generation * self.games + g for g in range(self.games)]
+        tasks = [(c, self.full_weights(params), float(params[-1]), seed, self.max_pieces)
+                 for c, params in enumerate(candidates) for seed in seeds]
+        lines = np.zeros(len(candidates))
+        pieces = np.zeros(len(candidates))
+        for c, game_lines, game_pieces in pool.imap_unordered(_play, tasks, chunksize=max(1, len(tasks) // (4 * self.processes))):
+            lines[c] += game_lines
+            pieces[c] += game_pieces
+        return lines / self.games, pieces / self.games
+
+    def step(self, pool):
+        start = time.perf_counter()
+        rng = np.random.default_rng([self.seed, self.generation])
+        candidates = self.mean + self.std * rng.standard_normal((self.population, len(self.mean)))
+        fitness, pieces = self.evaluate(candidates, pool)
+        order = np.argsort(-fitness)
+        elite = candidates[order[:self.elite]]
+        extra = self.noise * self.noise_decay ** self.generation
+        self.mean = elite.mean(axis=0)
+        self.std = np.sqrt(elite.var(axis=0) + extra)
+        if self.best is None or fitness[order[0]] > self.best[0]:
+            self.best = (float(fitness[order[0]]), candidates[order[0]].tolist())
+        self.generation += 1
+        record = {'generation': self.generation, 'mean_lines': float(fitness.mean()),
+                  'elite_lines': float(fitness[order[:self.elite]].mean()), 'best_lines': float(fitness[order[0]]),
+                  'mean_pieces': float(pieces.mean()), 'seconds': time.perf_counter() - start,
+                  'games_per_sec': len(candidates) * self.games / (time.perf_counter() - start)}
+        self.history.append(record)
+        if self.directory is not None:
+            self.save()
+        return record
+
+    def run(self, generations, log=True):
+        with mp.get_context().Pool(self.processes) as pool:
+            while self.generation < generations:
+                record = self.step(pool)
+                if log:
+                    print(f"Generation {record['generation']}: lines mean {record['mean_lines']:.1f}, "
+                          f"elite {record['elite_lines']:.1f}, best {record['best_lines']:.1f}, "
+                          f"pieces {record['mean_pieces']:.0f}, {record['games_per_sec']:.1f} games/s")
+        return self.weight_file(self.mean)
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def save(self):
+        self._write_json('cem.json', {'features': self.features, 'generation': self.generation,
+                                      'mean': self.mean.tolist(), 'std': self.std.tolist(), 'best': self.best,
+                                      'history': self.history})
+        self._write_json('weights.json', self.weight_file(self.mean))
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        if state['features'] != self.features:
+            raise ValueError(f"{path} was written for features {state['features']}")
+        self.generation = state['generation']
+        self.mean = np.array(state['mean'])
+        self.std = np.array(state['std'])
+        self.best = state['best']
+        self.history = state['history']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune linear placement heuristic weights with the cross-entropy method.")
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--population', type=int, default=100)
+    parser.add_argument('--elite-frac', type=float, default=0.1)
+    parser.add_argument('--games', type=int, default=10, help="Seeded games per candidate")
+    parser.add_argument('--max-pieces', type=int, default=1000, help="Cut games off after this many pieces")
+    parser.add_argument('--features', nargs='+', default=DEFAULT_FEATURES, choices=FEATURE_NAMES)
+    parser.add_argument('--initial-std', type=float, default=10.0)
+    parser.add_argument('--noise', type=float, default=4.0, help="Extra variance added to the refit distribution")
+    parser.add_argument('--noise-decay', type=float, default=0.5, help="Per-generation factor on the extra variance")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='cem', help="Directory for the per-generation state and weights.json")
+    args = parser.parse_args(argv)
+    optimizer = CrossEntropyOptimizer(args.features, args.population, args.elite_frac, args.games, args.max_pieces,
+                                      args.initial_std, args.noise, args.noise_decay, args.processes, args.seed, args.out)
+    optimizer.run(args.generations)
+    print(f"Weights written to {os.path.join(args.out, 'weights.json')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import json
+import os
+import random
+import shutil
+import threading
+import numpy as np
+
+def _json_state(state):
+    '''
+    Turns nested RNG state tuples and arrays into JSON lists.
+    '''
+    if isinstance(state, (tuple, list)):
+        return [_json_state(item) for item in state]
+    if isinstance(state, np.ndarray):
+        return state.tolist()
+    if isinstance(state, np.generic):
+        return state.item()
+    return state
+
+def _python_rng_state(state):
+    version, internal, gauss = state
+    return (version, tuple(internal), gauss)
+
+def _numpy_rng_state(state):
+    name, keys, pos, has_gauss, cached = state
+    return (name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached)
+
+def capture(trainer):
+    '''
+    Copies everything needed to resume a DQNTrainer: network, target network and optimizer variables,
+    replay memory, epsilon and counters, and the env, replay, NumPy and Python RNG states.
+    Returns ({name: array}, JSON-able dict); the copies no longer change as training goes on.
+    '''
+    model = trainer.model
+    if not model.optimizer.built:
+        model.optimizer.build(model.trainable_variables)
+    arrays = {}
+    for i, weight in enumerate(model.get_weights()):
+        arrays[f'model_{i}'] = weight
+    if trainer.target_model is not model:
+        for i, weight in enumerate(trainer.target_model.get_weights()):
+            arrays[f'target_{i}'] = weight
+    for i, variable in enumerate(model.optimizer.variables):
+        arrays[f'optimizer_{i}'] = variable.numpy()
+    replay_arrays, replay_state = trainer.memory.state_dict()
+    for name, array in replay_arrays.items():
+        arrays[f'replay_{name}'] = array
+    state = {
+        'epsilon': trainer.epsilon,
+        'steps': trainer.steps,
+        'updates': trainer.updates,
+        'episode': trainer.episode,
+        'replay': replay_state,
+        'rng': {'env': _json_state(trainer.env.rng.getstate()), 'python': _json_state(random.getstate()),
+                'numpy': _json_state(np.random.get_state())},
+    }
+    return arrays, state
+
+def restore(trainer, path):
+    '''
+    Loads a checkpoint directory written by Checkpointer into an existing DQNTrainer built with the same settings.
+    '''
+    with open(os.path.join(path, 'state.json')) as f:
+        state = json.load(f)
+    with np.load(os.path.join(path, 'arrays.npz')) as data:
+        arrays = {name: data[name] for name in data.files}
+    model = trainer.model
+    model.set_weights([arrays[f'model_{i}'] for i in range(len(model.weights))])
+    if trainer.target_model is not model:
+        trainer.target_model.set_weights([arrays[f'target_{i}'] for i in range(len(trainer.target_model.weights))])
+    if not model.optimizer.built:
+        model.optimizer.build(model.trainable_variables)
+    for i, variable in enumerate(model.optimizer.variables):
+        variable.assign(arrays[f'optimizer_{i}'])
+    trainer.memory.load_state_dict({name[len('replay_'):]: array for name, array in arrays.items() if name.startswith('replay_')},
+                                   state['replay'])
+    trainer.epsilon = state['epsilon']
+    trainer.steps = state['steps']
+    trainer.updates = state['updates']
+    trainer.episode = state['episode']
+    trainer.env.rng.setstate(state['rng']['env'])
+    random.setstate(_python_rng_state(state['rng']['python']))
+    np.random.set_state(_numpy_rng_state(state['rng']['numpy']))
+
+def latest(directory):
+    '''
+    Path of the newest complete checkpoint in `directory`, or None.
+    '''
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory) if name.startswith('ckpt-') and not name.endswith('.tmp'))
+    return os.path.join(directory, names[-1]) if names else None
+
+class Checkpointer:
+    '''
+    Periodically checkpoints a DQNTrainer to `directory`. The state is copied on the training thread
+    (capture()), then written by a background thread into ckpt-<episode>.tmp, fsynced and renamed to
+    ckpt-<episode>, so a crash never leaves a partial checkpoint under a final name. Only the newest
+    `keep` checkpoints are kept. Replay memory is stored bit-packed, as held in memory.
+    '''
+    def __init__(self, directory, every=100, keep=3):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.thread = None
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+
+    def maybe_save(self, trainer):
+        if self.every and trainer.episode % self.every == 0:
+            self.save(trainer)
+
+    def save(self, trainer, block=False):
+        self.wait()  # One write in flight at a time
+        arrays, state = capture(trainer)
+        path = os.path.join(self.directory, f"ckpt-{trainer.episode:09d}")
+        self.thread = threading.Thread(target=self._write, args=(path, arrays, state))
+        self.thread.start()
+        if block:
+            self.wait()
+        return path
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _write(self, path, arrays, state):
+        try:
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            with open(os.path.join(tmp_path, 'arrays.npz'), 'wb') as f:
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            with open(os.path.join(tmp_path, 'state.json'), 'w') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+            if hasattr(os, 'O_DIRECTORY'):
+                fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self.prune()
+        except Exception as error:
+            self.error = error
+
+    def prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith('ckpt-') and not name.endswith('.tmp'))
+        for name in names[:-self.keep] if self.keep else []:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
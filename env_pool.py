@@ -0,0 +1,158 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import random
+from tetris_env import TetrisEnv
+
+def _buffer_views(buf, num_envs):
+    '''
+    Lays out the shared block as actions, observations, rewards and dones and returns NumPy views of it.
+    '''
+    actions = np.ndarray((num_envs,), dtype=np.int64, buffer=buf, offset=0)
+    offset = actions.nbytes
+    states = np.ndarray((num_envs, 2, 20, 10), dtype=np.float32, buffer=buf, offset=offset)
+    offset += states.nbytes
+    rewards = np.ndarray((num_envs,), dtype=np.float32, buffer=buf, offset=offset)
+    offset += rewards.nbytes
+    dones = np.ndarray((num_envs,), dtype=np.bool_, buffer=buf, offset=offset)
+    return actions, states, rewards, dones
+
+def _buffer_size(num_envs):
+    return num_envs * (8 + 2 * 20 * 10 * 4 + 4 + 1)
+
+def _worker(remote, shm_name, num_envs, start, count, env_fn, seed):
+    '''
+    Runs `count` environments for slots [start, start + count) of the shared buffers.
+    Only short command strings travel over the pipe; all data goes through shared memory.
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    actions, states, rewards, dones = _buffer_views(shm.buf, num_envs)
+    if seed is not None:
+        random.seed(seed)
+    envs = [env_fn() for _ in range(count)]
+    try:
+        while True:
+            cmd = remote.recv()
+            if cmd == 'step':
+                for i, env in enumerate(envs, start):
+                    state, reward, done = env.step(int(actions[i]))
+                    if done:
+                        state = env.reset()
+                    states[i] = state
+                    rewards[i] = reward
+                    dones[i] = done
+            elif cmd == 'reset':
+                for i, env in enumerate(envs, start):
+                    states[i] = env.reset()
+                    rewards[i] = 0
+                    dones[i] = False
+            elif cmd == 'close':
+                break
+            remote.send(True)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del actions, states, rewards, dones
+        shm.close()
+
+class TetrisEnvPool:
+    '''
+    Runs TetrisEnv instances in worker processes that write observations, rewards and dones
+    straight into one shared memory block. step(actions)/reset() are synchronous;
+    step_async(actions)/step_wait() let the caller overlap work with the env step.
+    Games that end are reset by their worker, and a worker that dies is restarted with fresh games.
+    '''
+    def __init__(self, num_envs, envs_per_worker=1, env_fn=TetrisEnv, seed=None, context=None):
+        self.num_envs = num_envs
+        self.envs_per_worker = envs_per_worker
+        self.env_fn = env_fn
+        self.seed = seed
+        self.ctx = mp.get_context(context)
+        self.restarts = 0
+        self.shm = shared_memory.SharedMemory(create=True, size=_buffer_size(num_envs))
+        self.actions, self.states, self.rewards, self.dones = _buffer_views(self.shm.buf, num_envs)
+        self.slots = [(start, min(envs_per_worker, num_envs - start)) for start in range(0, num_envs, envs_per_worker)]
+        self.processes = [None] * len(self.slots)
+        self.remotes = [None] * len(self.slots)
+        self.waiting = False
+        self.closed = False
+        for w in range(len(self.slots)):
+            self._start_worker(w)
+
+    def _start_worker(self, w):
+        start, count = self.slots[w]
+        seed = None if self.seed is None else self.seed + w + len(self.slots) * self.restarts
+        remote, work_remote = self.ctx.Pipe()
+        process = self.ctx.Process(target=_worker, args=(work_remote, self.shm.name, self.num_envs, start, count, self.env_fn, seed), daemon=True)
+        process.start()
+        work_remote.close()
+        self.processes[w] = process
+        self.remotes[w] = remote
+
+    def _restart_worker(self, w):
+        '''
+        Replaces a crashed worker; its games start over and are reported as done.
+        '''
+        self.restarts += 1
+        self.remotes[w].close()
+        if self.processes[w].is_alive():
+            self.processes[w].terminate()
+        self.processes[w].join()
+        self._start_worker(w)
+        self.remotes[w].send('reset')
+        self.remotes[w].recv()
+        start, count = self.slots[w]
+        self.dones[start:start + count] = True
+
+    def _send_all(self, cmd):
+        for w, remote in enumerate(self.remotes):
+            try:
+                remote.send(cmd)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Detected and restarted in _wait_all
+
+    def _wait_all(self):
+        for w, remote in enumerate(self.remotes):
+            try:
+                remote.recv()
+            except (EOFError, ConnectionResetError):
+                self._restart_worker(w)
+
+    def reset(self):
+        self._send_all('reset')
+        self._wait_all()
+        return self.states.copy()
+
+    def step_async(self, actions):
+        self.actions[:] = actions
+        self._send_all('step')
+        self.waiting = True
+
+    def step_wait(self):
+        '''
+        Returns (states, rewards, dones) as copies of the shared buffers.
+        '''
+        self._wait_all()
+        self.waiting = False
+        return self.states.copy(), self.rewards.copy(), self.dones.copy()
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self._wait_all()
+        self._send_all('close')
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for remote in self.remotes:
+            remote.close()
+        del self.actions, self.states, self.rewards, self.dones
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
@@ -0,0 +1,159 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from tetris_env import TetrisEnv
+from pieces import PieceGenerator
+
+class RandomPolicy:
+    '''
+    Uniformly random primitive actions, drawn from a generator reseeded with each game's seed.
+    '''
+    action_mode = 'primitive'
+
+    def reset(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, env, state):
+        return int(self.rng.integers(env.action_space))
+
+class PlannerPolicy:
+    '''
+    Placement-mode play with a planner.BeamPlanner; depth 1 is the greedy linear heuristic.
+    '''
+    action_mode = 'placement'
+
+    def __init__(self, planner):
+        self.planner = planner
+
+    def reset(self, seed):
+        pass
+
+    def act(self, env, state):
+        return self.planner.plan(env)
+
+class QPolicy:
+    '''
+    Greedy primitive-mode play with a Q-function mapping a (1, 400) batch of states to Q-values.
+    '''
+    action_mode = 'primitive'
+
+    def __init__(self, q_values):
+        self.q_values = q_values
+
+    def reset(self, seed):
+        pass
+
+    def act(self, env, state):
+        return int(np.argmax(np.asarray(self.q_values(state.reshape(1, -1)))[0]))
+
+def load_policy(spec):
+    '''
+    Builds a policy from a spec string: 'random', 'heuristic[:weights.json]' (greedy placements),
+    'beam[:weights.json]' (planner.BeamPlanner with the preview piece), 'model:path' (Keras Q-model)
+    or 'numpy:path.npz' (policy_export.NumpyPolicy).
+    '''
+    kind, _, path = spec.partition(':')
+    if kind == 'random':
+        return RandomPolicy()
+    if kind in ('heuristic', 'beam'):
+        from planner import BeamPlanner, HeuristicEvaluator
+        evaluator = HeuristicEvaluator.load(path) if path else HeuristicEvaluator()
+        return PlannerPolicy(BeamPlanner(evaluator, depth=1 if kind == 'heuristic' else 2))
+    if kind == 'model':
+        import tensorflow as tf
+        model = tf.keras.models.load_model(path)
+        return QPolicy(tf.function(lambda states: model(states, training=False)))
+    if kind == 'numpy':
+        from policy_export import NumpyPolicy
+        return QPolicy(NumpyPolicy.load(path).q_values)
+    raise ValueError(f"Unknown policy spec: {spec}")
+
+def play_game(policy, seed, pieces='uniform', max_steps=None):
+    '''
+    Plays one game whose piece sequence is fixed by `seed`, stopping after `max_steps` actions.
+    The score is the summed env reward (TetrisEnv.reward_dict per locked piece).
+    Returns {'seed', 'score', 'lines', 'pieces', 'steps', 'seconds'}.
+    '''
+    env = TetrisEnv(action_mode=policy.action_mode, seed=seed, pieces=pieces)
+    policy.reset(seed)
+    start = time.perf_counter()
+    state = env.reset()
+    score = placed = steps = 0
+    done = False
+    while not done and (max_steps is None or steps < max_steps):
+        action = policy.act(env, state)
+        if action is None:
+            break
+        piece = env.current_piece
+        state, reward, done = env.step(action)
+        score += reward
+        steps += 1
+        placed += env.current_piece is not piece or done
+    return {'seed': seed, 'score': score, 'lines': env.lines_cleared, 'pieces': placed, 'steps': steps,
+            'seconds': time.perf_counter() - start}
+
+_policy = None
+
+def _init_worker(spec):
+    global _policy
+    _policy = load_policy(spec)
+
+def _play(task):
+    return play_game(_policy, *task)
+
+def evaluate(spec, games=100, seed=0, pieces='uniform', max_steps=None, processes=None):
+    '''
+    Plays `games` games of the policy `spec` (see load_policy) with seeds seed, seed + 1, ... on a
+    process pool; each worker loads the policy once. Game results depend only on the policy and the
+    seeds, so the same arguments give the same games whatever the number of processes.
+    Returns (per-game results in seed order, summary).
+    '''
+    processes = processes or os.cpu_count()
+    tasks = [(seed + g, pieces, max_steps) for g in range(games)]
+    start = time.perf_counter()
+    with mp.get_context().Pool(min(processes, games), _init_worker, (spec,)) as pool:
+        results = pool.map(_play, tasks, chunksize=max(1, games // (4 * processes)))
+    return results, summarize(results, time.perf_counter() - start)
+
+def summarize(results, seconds):
+    summary = {'games': len(results)}
+    for key in ('score', 'lines', 'pieces'):
+        values = np.array([result[key] for result in results], dtype=np.float64)
+        p10, p50, p90 = np.percentile(values, [10, 50, 90])
+        summary[key] = {'mean': float(values.mean()), 'std': float(values.std()), 'min': float(values.min()),
+                        'p10': float(p10), 'p50': float(p50), 'p90': float(p90), 'max': float(values.max())}
+    steps = sum(result['steps'] for result in results)
+    summary['steps'] = steps
+    summary['seconds'] = seconds
+    summary['steps_per_sec'] = steps / seconds if seconds else 0.0
+    summary['steps_per_sec_per_worker'] = steps / sum(result['seconds'] for result in results) if results else 0.0
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a policy over seeded TetrisEnv games in parallel.")
+    parser.add_argument('policy', help="random, heuristic[:weights.json], beam[:weights.json], model:path or numpy:path.npz")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help="Game g uses seed + g for its pieces and any policy randomness")
+    parser.add_argument('--pieces', choices=PieceGenerator.MODES, default='uniform', help="Piece sequence: independent draws or 7-bag")
+    parser.add_argument('--max-steps', type=int, default=None, help="Cut games off after this many actions")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--out', default=None, help="Write the summary and per-game results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results, summary = evaluate(args.policy, args.games, args.seed, args.pieces, args.max_steps, args.processes)
+    print(f"{summary['games']} games of {args.policy} ({args.pieces} pieces, seeds {args.seed}-{args.seed + args.games - 1})")
+    for key in ('score', 'lines', 'pieces'):
+        stats = summary[key]
+        print(f"  {key:6s} mean {stats['mean']:9.1f}  p10 {stats['p10']:9.1f}  p50 {stats['p50']:9.1f}  p90 {stats['p90']:9.1f}")
+    print(f"  {summary['steps']} steps in {summary['seconds']:.1f}s: {summary['steps_per_sec']:.0f} steps/s, "
+          f"{summary['steps_per_sec_per_worker']:.0f} per worker")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'policy': args.policy, 'pieces': args.pieces, 'seed': args.seed, 'max_steps': args.max_steps,
+                       'summary': summary, 'games': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
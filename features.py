@@ -0,0 +1,51 @@
+import numpy as np
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+
+FEATURE_NAMES = ([f'height_{c}' for c in range(GRID_WIDTH)] +
+                 [f'holes_{c}' for c in range(GRID_WIDTH)] +
+                 [f'well_{c}' for c in range(GRID_WIDTH)] +
+                 ['aggregate_height', 'max_height', 'holes', 'bumpiness', 'row_transitions', 'column_transitions'])
+NUM_FEATURES = len(FEATURE_NAMES)
+
+def column_stats(boards):
+    '''
+    Per-column statistics of boards shaped (..., rows, columns):
+    heights, holes (empty cells under the column top) and column transitions
+    (filled/empty changes going down, with empty space above and a filled floor below).
+    '''
+    boards = np.asarray(boards, dtype=bool)
+    rows = boards.shape[-2]
+    top = np.where(boards.any(axis=-2), boards.argmax(axis=-2), rows)
+    heights = rows - top
+    holes = heights - boards.sum(axis=-2)
+    transitions = (boards[..., 1:, :] != boards[..., :-1, :]).sum(axis=-2) + boards[..., 0, :] + ~boards[..., -1, :]
+    return heights, holes, transitions
+
+def row_transitions(boards):
+    '''
+    Filled/empty changes along each row of boards shaped (..., rows, columns), with filled walls on both sides.
+    '''
+    boards = np.asarray(boards, dtype=bool)
+    return (boards[..., 1:] != boards[..., :-1]).sum(axis=-1) + ~boards[..., 0] + ~boards[..., -1]
+
+def combine(heights, holes, column_transitions, total_row_transitions, rows=GRID_HEIGHT):
+    '''
+    Builds the float32 feature vector(s) described by FEATURE_NAMES from per-column stats.
+    '''
+    walls = np.full(heights.shape[:-1] + (1,), rows)
+    padded = np.concatenate([walls, heights, walls], axis=-1)
+    wells = np.clip(np.minimum(padded[..., :-2], padded[..., 2:]) - heights, 0, None)
+    aggregates = np.stack([heights.sum(axis=-1), heights.max(axis=-1), holes.sum(axis=-1),
+                           np.abs(np.diff(heights, axis=-1)).sum(axis=-1), total_row_transitions,
+                           column_transitions.sum(axis=-1)], axis=-1)
+    return np.concatenate([heights, holes, wells, aggregates], axis=-1).astype(np.float32)
+
+def board_features(boards):
+    '''
+    Feature vectors for a batch of boards: (N, 20, 10) -> (N, NUM_FEATURES); also accepts a single board.
+    '''
+    boards = np.asarray(boards, dtype=bool)
+    heights, holes, transitions = column_stats(boards)
+    return combine(heights, holes, transitions, row_transitions(boards).sum(axis=-1), boards.shape[-2])
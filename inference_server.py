@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+import numpy as np
+
+class InferenceClient:
+    '''
+    Caller side of an InferenceServer: sends one bit-packed observation and blocks for the greedy action.
+    Picklable, so it can be handed to an actor process. Tracks its own round-trip latency.
+    '''
+    def __init__(self, client_id, requests, replies):
+        self.client_id = client_id
+        self.requests = requests
+        self.replies = replies
+        self.calls = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def act(self, state):
+        start = time.monotonic()
+        self.requests.put((self.client_id, start, np.packbits(np.asarray(state).reshape(-1) != 0)))
+        action = self.replies.get()
+        latency = time.monotonic() - start
+        self.calls += 1
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return action
+
+    def stats(self):
+        return {'calls': self.calls, 'mean_latency_ms': 1000 * self.latency / self.calls if self.calls else 0.0,
+                'max_latency_ms': 1000 * self.max_latency}
+
+class InferenceServer:
+    '''
+    Batches greedy action selection for many callers into single compiled forward passes of `model`.
+    A background thread takes the first pending request, keeps collecting until `max_batch_size`
+    requests are in or `max_wait` seconds have passed, runs the batch and replies to each caller.
+    Callers use the InferenceClient from client(); with an mp context the queues are process-safe,
+    otherwise the clients are for threads of this process. States must be 0/1 (they travel bit-packed).
+    '''
+    def __init__(self, model, num_clients, max_batch_size=256, max_wait=0.002, context=None):
+        import tensorflow as tf
+        self.state_size = model.input_shape[-1]
+        self.q_values = tf.function(lambda states: model(states, training=False),
+                                    input_signature=[tf.TensorSpec((None, self.state_size), tf.float32)])
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        make_queue = context.Queue if context is not None else queue.Queue
+        self.requests = make_queue()
+        self.replies = [make_queue() for _ in range(num_clients)]
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.batches = 0
+        self.served = 0
+        self.queue_wait = 0.0
+        self.compute_time = 0.0
+        self.batch_sizes = np.zeros(max_batch_size + 1, dtype=np.int64)
+
+    def client(self, client_id):
+        return InferenceClient(client_id, self.requests, self.replies[client_id])
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def collect(self):
+        '''
+        Returns the next batch of requests, or an empty list if none arrived within 0.1s.
+        '''
+        try:
+            batch = [self.requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def serve(self):
+        while not self.stop_event.is_set():
+            batch = self.collect()
+            if batch:
+                self.run_batch(batch)
+
+    def run_batch(self, batch):
+        client_ids, sent, packed = zip(*batch)
+        start = time.monotonic()
+        states = np.unpackbits(np.stack(packed), axis=1, count=self.state_size).astype(np.float32)
+        actions = np.argmax(self.q_values(states).numpy(), axis=1)
+        self.compute_time += time.monotonic() - start
+        for client_id, action in zip(client_ids, actions.tolist()):
+            self.replies[client_id].put(action)
+        self.queue_wait += sum(start - t for t in sent)
+        self.batches += 1
+        self.served += len(batch)
+        self.batch_sizes[len(batch)] += 1
+
+    def stats(self):
+        '''
+        Batch fill and server-side latency: mean time a request waited before its batch ran, and forward pass time per batch.
+        '''
+        batches = max(self.batches, 1)
+        return {
+            'batches': self.batches,
+            'requests': self.served,
+            'mean_batch_size': self.served / batches,
+            'batch_fill': self.served / (batches * self.max_batch_size),
+            'mean_queue_wait_ms': 1000 * self.queue_wait / max(self.served, 1),
+            'mean_compute_ms': 1000 * self.compute_time / batches,
+        }
@@ -0,0 +1,169 @@
+import cProfile
+import contextlib
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ('metrics', 'phase', 'start')
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.phase, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    '''
+    Per-phase timers and event counters for the env and training loop.
+    Disabled by default: hot paths guard with `if metrics.enabled:` and timer() hands back a shared
+    no-op context manager, so instrumentation costs one attribute check until enable() is called.
+    When enabled, maybe_report() prints a summary and appends a row to a .csv or .jsonl file
+    every `report_every` seconds.
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.report_every = 10.0
+        self.reset()
+
+    def reset(self):
+        self.counters = Counter()
+        self.times = defaultdict(float)
+        self.calls = Counter()
+        self.started = self.last_report = time.perf_counter()
+        self.last_counters = Counter()
+        self.csv_fields = None
+
+    def enable(self, path=None, report_every=10.0):
+        self.enabled = True
+        self.path = path
+        self.report_every = report_every
+        self.reset()
+
+    def disable(self):
+        self.enabled = False
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self, phase, seconds):
+        self.times[phase] += seconds
+        self.calls[phase] += 1
+
+    def timer(self, phase):
+        '''
+        Context manager timing one occurrence of `phase`; a no-op while disabled.
+        '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, phase)
+
+    def snapshot(self):
+        '''
+        Returns a flat dict: elapsed seconds, cumulative counters, and per-phase total seconds, calls and mean microseconds.
+        '''
+        now = time.perf_counter()
+        row = {'time': time.time(), 'elapsed': now - self.started}
+        row.update(self.counters)
+        for phase, total in self.times.items():
+            row[f'{phase}_seconds'] = total
+            row[f'{phase}_calls'] = self.calls[phase]
+            row[f'{phase}_mean_us'] = 1e6 * total / self.calls[phase]
+        return row
+
+    def maybe_report(self, force=False):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.report_every:
+            return
+        interval = now - self.last_report
+        row = self.snapshot()
+        rates = ', '.join(f"{name} {(value - self.last_counters[name]) / interval:.1f}/s" for name, value in sorted(self.counters.items()))
+        elapsed = row['elapsed']
+        phases = ', '.join(f"{phase} {100 * total / elapsed:.1f}% ({1e6 * total / self.calls[phase]:.1f}us)"
+                           for phase, total in sorted(self.times.items(), key=lambda item: -item[1]))
+        print(f"[metrics {elapsed:.0f}s] {rates}")
+        print(f"[metrics {elapsed:.0f}s] time share: {phases}")
+        if self.path:
+            self._write(row)
+        self.last_report = now
+        self.last_counters = Counter(self.counters)
+
+    def _write(self, row):
+        if self.path.endswith('.csv'):
+            new_fields = [field for field in row if field not in (self.csv_fields or [])]
+            if new_fields:
+                # A counter or phase appeared: rewrite the file with the wider header
+                rows = []
+                if self.csv_fields is not None:
+                    with open(self.path, newline='') as f:
+                        rows = list(csv.DictReader(f))
+                self.csv_fields = (self.csv_fields or []) + new_fields
+                with open(self.path, 'w', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=self.csv_fields)
+                    writer.writeheader()
+                    writer.writerows(rows)
+            with open(self.path, 'a', newline='') as f:
+                csv.DictWriter(f, fieldnames=self.csv_fields).writerow(row)
+        else:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+
+    @contextlib.contextmanager
+    def profile(self, path, sample_interval=0.005):
+        '''
+        Runs the body under cProfile (written to path + '.prof') while a background thread samples
+        the calling thread's stack every `sample_interval` seconds and writes the counts as collapsed
+        stacks (path + '.stacks', one 'frame;frame;frame count' line each, ready for flamegraph tools).
+        '''
+        target = threading.get_ident()
+        stacks = Counter()
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(sample_interval):
+                frame = sys._current_frames().get(target)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stacks[';'.join(reversed(names))] += 1
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        profiler = cProfile.Profile()
+        sampler.start()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            stop.set()
+            sampler.join()
+            profiler.dump_stats(path + '.prof')
+            with open(path + '.stacks', 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+metrics = Metrics()
@@ -1,75 +1,244 @@
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Input, Dense
+from tensorflow.keras.optimizers import Adam
 import tensorflow as tf
-from tetris_env import TetrisEnv 
+from tetris_env import TetrisEnv
+from replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+from trajectory_store import TrajectoryRecorder
+from metrics import metrics
+from checkpoint import Checkpointer, latest, restore
 import numpy as np
-import random
-from collections import deque
+import argparse
+import signal
+import threading
 
-print("Num GPUs Available: ", len(tf.config.list_physical_devices('GPU')))
-'''
-memory = deque(maxlen=1000)
+def build_model(state_size, action_size, hidden=(128, 128), learning_rate=1e-3):
+    '''
+    Builds the Q-network: flattened state -> Dense(relu) layers -> one linear output per action.
+    '''
+    model = Sequential([Input(shape=(state_size,))] +
+                       [Dense(units, activation='relu') for units in hidden] +
+                       [Dense(action_size, activation='linear')])
+    model.compile(optimizer=Adam(learning_rate), loss='mse')
+    return model
 
-game = TetrisEnv()
-game.reset()
-state_size = np.prod(game.get_state().shape)
-action_size = game.action_space
+class DQNTrainer:
+    '''
+    DQN training loop for TetrisEnv: epsilon-greedy acting, replay memory, and batched updates where
+    Q(s) and Q(s') for the whole batch are each one compiled forward pass. An optional target network
+    (synced every `target_update` updates, 0 to disable) provides Q(s'). With `prioritized=True`
+    the replay memory is a PrioritizedReplayBuffer and the loss is weighted by importance-sampling weights.
+    If a TrajectoryRecorder is given, every episode played is also appended to it.
+    '''
+    def __init__(self, env=None, hidden=(128, 128), learning_rate=1e-3, gamma=0.99, batch_size=32,
+                 memory_size=1000000, epsilon=1.0, epsilon_min=0.1, epsilon_decay=0.995,
+                 target_update=1000, train_every=1, prioritized=False, alpha=0.6, beta=0.4, beta_steps=100000,
+                 recorder=None):
+        self.env = env if env is not None else TetrisEnv()
+        self.state_size = int(np.prod(self.env.get_state().shape))
+        self.action_size = self.env.action_space
+        self.gamma = gamma
+        self.batch_size = batch_size
+        self.epsilon = epsilon
+        self.epsilon_min = epsilon_min
+        self.epsilon_decay = epsilon_decay
+        self.target_update = target_update
+        self.train_every = train_every
+        self.prioritized = prioritized
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(memory_size, self.env.get_state().shape, alpha=alpha, beta=beta, beta_steps=beta_steps)
+        else:
+            self.memory = ReplayBuffer(memory_size, self.env.get_state().shape)
+        self.model = build_model(self.state_size, self.action_size, hidden, learning_rate)
+        if target_update:
+            self.target_model = build_model(self.state_size, self.action_size, hidden, learning_rate)
+            self.target_model.set_weights(self.model.get_weights())
+        else:
+            self.target_model = self.model
+        self.recorder = recorder
+        self.steps = 0
+        self.updates = 0
+        self.episode = 0
 
-num_episodes = 10000
-epsilon = 1.0         # Start fully random
-epsilon_min = 0.1     # Minimum exploration
-epsilon_decay = 0.995 # Decay rate
+    @tf.function
+    def q_values(self, states):
+        return self.model(states, training=False)
 
-batch_size=32
-def train_on_batch(memory, batch_size=32):
-    batch = random.sample(memory, batch_size)
-    states = []
-    targets = []
-    gamma = 0.99  # Discount factor
+    @tf.function
+    def _train_step(self, states, actions, rewards, next_states, dones, weights):
+        q_next = self.target_model(next_states, training=False)
+        targets = rewards + self.gamma * (1.0 - dones) * tf.reduce_max(q_next, axis=1)
+        with tf.GradientTape() as tape:
+            q = self.model(states, training=True)
+            q_taken = tf.gather(q, actions, axis=1, batch_dims=1)
+            td_errors = targets - q_taken
+            loss = tf.reduce_mean(weights * tf.square(td_errors))
+        grads = tape.gradient(loss, self.model.trainable_variables)
+        self.model.optimizer.apply_gradients(zip(grads, self.model.trainable_variables))
+        return loss, td_errors
 
-    for state, action, reward, next_state, done in batch:
-        state = state.reshape(1, -1)
-        next_state = next_state.reshape(1, -1)
-        q_values = model.predict(state)
-        q_next = model.predict(next_state)
-        target = q_values.copy()
-        if done:
-            target[0, action] = reward
-        else:
-            target[0, action] = reward + gamma * np.max(q_next)
-        states.append(state[0])
-        targets.append(target[0])
+    def act(self, state):
+        '''
+        Epsilon-greedy action for one flattened state.
+        '''
+        if np.random.rand() < self.epsilon:
+            return np.random.randint(0, self.action_size)
+        if metrics.enabled:
+            metrics.count('predict_calls')
+        return int(np.argmax(self.q_values(state.reshape(1, -1))[0]))
+
+    def remember(self, state, action, reward, next_state, done):
+        self.memory.add(state, action, reward, next_state, done)
 
-    states = np.array(states)
-    targets = np.array(targets)
-    model.train_on_batch(states, targets)
+    def train_on_batch(self):
+        if metrics.enabled:
+            metrics.count('train_calls')
+        with metrics.timer('replay_sample'):
+            batch = self.memory.sample(self.batch_size)
+        with metrics.timer('train_step'):
+            if self.prioritized:
+                states, actions, rewards, next_states, dones, idx, weights = batch
+                loss, td_errors = self._train_step(states, actions, rewards, next_states, dones, weights)
+                self.memory.update_priorities(idx, td_errors.numpy())
+            else:
+                loss, _ = self._train_step(*batch, np.ones(self.batch_size, dtype=np.float32))
+        self.updates += 1
+        if self.target_update and self.updates % self.target_update == 0:
+            self.target_model.set_weights(self.model.get_weights())
+        return float(loss)
 
-model =Sequential([
-    Input(shape=(state_size,)),
-    Dense(128, activation='relu'),
-    Dense(128, activation='relu'),
-    Dense(action_size, activation='linear')
-])
-model.compile(optimizer='adam', loss='mse')
+    def run_episode(self):
+        '''
+        Plays one episode, training every `train_every` env steps. Returns (score, steps).
+        '''
+        state = self.env.reset().flatten()
+        if self.recorder is not None:
+            self.recorder.reset(state, self.env.current_piece.shape_key)
+        done = False
+        score = 0
+        steps = 0
+        while not done:
+            with metrics.timer('act'):
+                action = self.act(state)
+            with metrics.timer('env_step'):
+                next_state, reward, done = self.env.step(action)
+            next_state = next_state.flatten()
+            with metrics.timer('replay_add'):
+                self.remember(state, action, reward, next_state, done)
+            if self.recorder is not None:
+                self.recorder.step(action, reward, next_state, done, self.env.current_piece.shape_key)
+            self.steps += 1
+            if len(self.memory) > self.batch_size and self.steps % self.train_every == 0:
+                self.train_on_batch()
+            state = next_state
+            score += reward
+            steps += 1
+            if metrics.enabled:
+                metrics.count('steps')
+                metrics.maybe_report()
+        if self.epsilon > self.epsilon_min:
+            self.epsilon *= self.epsilon_decay
+        self.episode += 1
+        if metrics.enabled:
+            metrics.count('episodes')
+        return score, steps
 
-memory=[]
-for episode in range(num_episodes):
-    state = game.reset().flatten()
-    done = False
-    while not done:
-        # Epsilon-greedy action selection
-        if np.random.rand() < epsilon:
-            action = np.random.randint(0, action_size)
+    def train(self, num_episodes, log_every=10, checkpointer=None, stop=None):
+        '''
+        Plays `num_episodes` episodes, or fewer if the `stop` event gets set; it is only checked between
+        episodes, so training always ends on an episode boundary. Returns the number of episodes played.
+        '''
+        for played in range(num_episodes):
+            if stop is not None and stop.is_set():
+                return played
+            score, steps = self.run_episode()
+            if log_every and self.episode % log_every == 0:
+                print(f"Episode {self.episode}: score {score}, steps {steps}, epsilon {self.epsilon:.3f}, updates {self.updates}")
+            if checkpointer is not None:
+                checkpointer.maybe_save(self)
+        return num_episodes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train a DQN agent on TetrisEnv.")
+    parser.add_argument('--episodes', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--gamma', type=float, default=0.99)
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--hidden', type=int, nargs='+', default=[128, 128])
+    parser.add_argument('--memory-size', type=int, default=1000000)
+    parser.add_argument('--epsilon', type=float, default=1.0)
+    parser.add_argument('--epsilon-min', type=float, default=0.1)
+    parser.add_argument('--epsilon-decay', type=float, default=0.995)
+    parser.add_argument('--target-update', type=int, default=1000, help="Updates between target network syncs, 0 to disable")
+    parser.add_argument('--train-every', type=int, default=1, help="Env steps per training update")
+    parser.add_argument('--prioritized', action='store_true', help="Use prioritized experience replay")
+    parser.add_argument('--alpha', type=float, default=0.6, help="Prioritization exponent")
+    parser.add_argument('--beta', type=float, default=0.4, help="Initial importance-sampling exponent, annealed to 1")
+    parser.add_argument('--beta-steps', type=int, default=100000, help="Updates over which beta is annealed")
+    parser.add_argument('--record', default=None, help="Directory to append every played episode to")
+    parser.add_argument('--metrics', default=None, help="Enable timers/counters and export them to this .csv or .jsonl file")
+    parser.add_argument('--metrics-every', type=float, default=10.0, help="Seconds between metrics summaries")
+    parser.add_argument('--profile', default=None, help="Run under cProfile and stack sampling, writing PATH.prof and PATH.stacks")
+    parser.add_argument('--log-every', type=int, default=10)
+    parser.add_argument('--save', default=None, help="Path to save the trained model (.keras)")
+    parser.add_argument('--checkpoint-dir', default=None, help="Directory for periodic full training-state checkpoints")
+    parser.add_argument('--checkpoint-every', type=int, default=100, help="Episodes between checkpoints")
+    parser.add_argument('--keep-checkpoints', type=int, default=3)
+    parser.add_argument('--resume', action='store_true', help="Continue from the newest checkpoint in --checkpoint-dir; --episodes is the total")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("Num GPUs Available: ", len(tf.config.list_physical_devices('GPU')))
+    recorder = TrajectoryRecorder(args.record) if args.record else None
+    trainer = DQNTrainer(hidden=tuple(args.hidden), learning_rate=args.learning_rate, gamma=args.gamma,
+                         batch_size=args.batch_size, memory_size=args.memory_size, epsilon=args.epsilon,
+                         epsilon_min=args.epsilon_min, epsilon_decay=args.epsilon_decay,
+                         target_update=args.target_update, train_every=args.train_every,
+                         prioritized=args.prioritized, alpha=args.alpha, beta=args.beta, beta_steps=args.beta_steps,
+                         recorder=recorder)
+    checkpointer = None
+    if args.checkpoint_dir:
+        checkpointer = Checkpointer(args.checkpoint_dir, args.checkpoint_every, args.keep_checkpoints)
+        path = latest(args.checkpoint_dir) if args.resume else None
+        if path:
+            restore(trainer, path)
+            print(f"Resumed from {path}: episode {trainer.episode}, updates {trainer.updates}, epsilon {trainer.epsilon:.3f}, replay {len(trainer.memory)}")
+    if args.metrics:
+        metrics.enable(args.metrics, args.metrics_every)
+    episodes = args.episodes - trainer.episode
+    # First Ctrl-C: finish the current episode, checkpoint and stop. Second: abort without a checkpoint,
+    # since mid-episode state (the env board) is not part of one
+    stop = threading.Event()
+    def interrupt(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print(f"Stopping after episode {trainer.episode + 1}; press Ctrl-C again to abort without a checkpoint")
+    signal.signal(signal.SIGINT, interrupt)
+    aborted = False
+    try:
+        if args.profile:
+            with metrics.profile(args.profile):
+                trainer.train(episodes, log_every=args.log_every, checkpointer=checkpointer, stop=stop)
         else:
-            q_values = model.predict(state.reshape(1, -1))
-            action = np.argmax(q_values)
-        next_state, reward, done = game.step(action)
-        # Store experience in replay buffer
-        memory.append((state, action, reward, next_state.flatten(), done))
-        # Sample batch and train
-        if len(memory) > batch_size:
-            train_on_batch(memory, batch_size)
-        state = next_state.flatten()
-    if epsilon > epsilon_min:
-        epsilon *= epsilon_decay
-'''
\ No newline at end of file
+            trainer.train(episodes, log_every=args.log_every, checkpointer=checkpointer, stop=stop)
+    except KeyboardInterrupt:
+        aborted = True
+        print(f"Aborted during episode {trainer.episode + 1}")
+    finally:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+    if stop.is_set() and not aborted:
+        print(f"Interrupted at episode {trainer.episode}")
+    if checkpointer is not None:
+        if not aborted and not (checkpointer.every and trainer.episode % checkpointer.every == 0):
+            checkpointer.save(trainer)  # Otherwise maybe_save already wrote this episode
+        checkpointer.wait()
+    metrics.maybe_report(force=True)
+    if recorder is not None:
+        recorder.close()
+    if args.save:
+        trainer.model.save(args.save)
+
+if __name__ == "__main__":
+    main()
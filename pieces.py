@@ -0,0 +1,39 @@
+import random
+
+SHAPE_KEYS = ['I', 'O', 'T', 'S', 'Z', 'J', 'L']
+
+class PieceGenerator:
+    '''
+    Seedable piece sequence. 'uniform' draws every piece independently, as the game always has;
+    '7bag' deals the seven shapes in shuffled bags, so each appears once per seven pieces.
+    getstate()/setstate() capture and rewind the sequence (setstate also accepts the JSON-decoded form).
+    '''
+    MODES = ('uniform', '7bag')
+
+    def __init__(self, seed=None, mode='uniform', keys=SHAPE_KEYS):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown piece generator mode: {mode}")
+        self.mode = mode
+        self.keys = list(keys)
+        self.rng = random.Random(seed)
+        self.bag = []
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+        self.bag = []
+
+    def draw(self):
+        if self.mode == 'uniform':
+            return self.rng.choice(self.keys)
+        if not self.bag:
+            self.bag = self.keys[:]
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+    def getstate(self):
+        return (self.rng.getstate(), tuple(self.bag))
+
+    def setstate(self, state):
+        (version, internal, gauss), bag = state
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.bag = list(bag)
@@ -0,0 +1,276 @@
+import argparse
+import json
+import time
+from collections import OrderedDict
+import numpy as np
+from tetris_env import TetrisEnv
+from features import FEATURE_NAMES, board_features
+
+# Hand-tuned linear agent weights (aggregate height, holes, bumpiness; lines cleared go through line_weight)
+HEURISTIC_WEIGHTS = {'aggregate_height': -0.51, 'holes': -0.36, 'bumpiness': -0.18}
+
+class HeuristicEvaluator:
+    '''
+    Linear value of boards over features.FEATURE_NAMES, plus line_weight per cleared line.
+    `weights` is a {feature name: weight} dict or a full-length weight vector.
+    '''
+    def __init__(self, weights=None, line_weight=0.76):
+        weights = HEURISTIC_WEIGHTS if weights is None else weights
+        if isinstance(weights, dict):
+            self.weights = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+            for name, weight in weights.items():
+                self.weights[FEATURE_NAMES.index(name)] = weight
+        else:
+            self.weights = np.asarray(weights, dtype=np.float32)
+        self.line_weight = line_weight
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Reads a weight file: {"weights": {feature name: weight}, "line_weight": weight}, as written by save() or cem.py.
+        '''
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['weights'], data['line_weight'])
+
+    def save(self, path):
+        weights = {name: float(weight) for name, weight in zip(FEATURE_NAMES, self.weights) if weight}
+        with open(path, 'w') as f:
+            json.dump({'weights': weights, 'line_weight': float(self.line_weight)}, f, indent=2)
+
+    def reward(self, lines):
+        return self.line_weight * lines
+
+    def __call__(self, boards, next_key=None):
+        return board_features(boards) @ self.weights
+
+class ModelEvaluator:
+    '''
+    Values boards with a Q-network from model.py: gamma * max Q of the state whose board plane is the
+    board and whose piece plane holds the next piece at its spawn position (empty when unknown).
+    Cleared lines earn TetrisEnv.reward_dict. Each call is one compiled forward pass over the batch.
+    '''
+    def __init__(self, model, gamma=0.99):
+        import tensorflow as tf
+        state_size = model.input_shape[-1]
+        self.q_values = tf.function(lambda states: model(states, training=False),
+                                    input_signature=[tf.TensorSpec((None, state_size), tf.float32)])
+        self.gamma = gamma
+        self.rewards = np.array([TetrisEnv.reward_dict[lines] for lines in range(5)], dtype=np.float32)
+        self.spawn = {}
+        for key in TetrisEnv.SHAPES:
+            piece = TetrisEnv.Piece(key, TetrisEnv.SHAPES)
+            plane = np.zeros((20, 10), dtype=np.float32)
+            for x, y in piece.get_blocks():
+                plane[y, x] = 1
+            self.spawn[key] = plane
+
+    def reward(self, lines):
+        return self.rewards[lines]
+
+    def __call__(self, boards, next_key=None):
+        states = np.zeros((len(boards), 2) + boards.shape[1:], dtype=np.float32)
+        states[:, 0] = boards
+        if next_key is not None:
+            states[:, 1] = self.spawn[next_key]
+        q = self.q_values(states.reshape(len(boards), -1)).numpy()
+        return self.gamma * q.max(axis=1)
+
+class BeamPlanner:
+    '''
+    Chooses placement actions (see TetrisEnv action_mode='placement') by beam search over the current
+    piece and the next-piece preview. Ply 1 places the current piece, ply 2 the preview piece and a
+    third ply, whose piece is unknown, averages the best placement value over all shapes. Each ply keeps
+    the `beam_width` best nodes, ranked by rewards along the path plus the evaluator's value of the board.
+    Board values are cached in an LRU transposition table of `cache_size` entries keyed by the packed
+    board and the piece to come, and only cache misses reach the evaluator, in one batch per ply.
+    With a `time_budget` (seconds per move) the search deepens one ply at a time and returns the best
+    action of the deepest ply that finished in time.
+    '''
+    def __init__(self, evaluator=None, beam_width=32, depth=2, time_budget=None, cache_size=200000):
+        if not 1 <= depth <= 3:
+            raise ValueError("depth must be 1 (current piece), 2 (with the preview) or 3 (plus one unknown piece)")
+        self.evaluator = evaluator if evaluator is not None else HeuristicEvaluator()
+        self.beam_width = beam_width
+        self.depth = depth
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.moves = 0
+        self.nodes = 0
+        self.search_time = 0.0
+        self.cache_lookups = 0
+        self.cache_hits = 0
+
+    def values(self, boards, next_key):
+        '''
+        Evaluator values of a batch of boards, through the transposition table.
+        '''
+        packed = np.packbits(boards.reshape(len(boards), -1), axis=1)
+        keys = [(row.tobytes(), next_key) for row in packed]
+        values = np.empty(len(keys), dtype=np.float32)
+        missing = []
+        cache = self.cache
+        for i, key in enumerate(keys):
+            value = cache.get(key)
+            if value is None:
+                missing.append(i)
+            else:
+                cache.move_to_end(key)
+                values[i] = value
+        self.cache_lookups += len(keys)
+        self.cache_hits += len(keys) - len(missing)
+        if missing:
+            fresh = np.asarray(self.evaluator(boards[missing], next_key), dtype=np.float32)
+            values[missing] = fresh
+            for i, value in zip(missing, fresh.tolist()):
+                cache[keys[i]] = value
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return values
+
+    def expand(self, boards, rewards, shape_key, next_key):
+        '''
+        Places `shape_key` every legal way on each board. Returns (parents, actions, boards, rewards, values)
+        of the children, where parents indexes the input boards.
+        '''
+        parents, actions, children, child_rewards = [], [], [], []
+        for i, board in enumerate(boards):
+            placed, placed_boards, lines = TetrisEnv.placements(board, shape_key)
+            parents.append(np.full(len(placed), i))
+            actions.append(placed)
+            children.append(placed_boards)
+            child_rewards.append(rewards[i] + self.evaluator.reward(lines))
+        children = np.concatenate(children)
+        child_rewards = np.concatenate(child_rewards).astype(np.float32)
+        self.nodes += len(children)
+        values = child_rewards + self.values(children, next_key) if len(children) else child_rewards
+        return np.concatenate(parents), np.concatenate(actions), children, child_rewards, values
+
+    def search(self, grid, pieces, depth, deadline=None):
+        '''
+        Searches `depth` plies from `grid` with the known `pieces` (current, preview). Returns
+        (root actions, values) of the last ply's nodes, or None if the deadline passed first.
+        '''
+        roots = np.array([-1])
+        boards = grid[None]
+        rewards = np.zeros(1, dtype=np.float32)
+        values = rewards
+        for ply in range(min(depth, len(pieces))):
+            next_key = pieces[ply + 1] if ply + 1 < len(pieces) else None
+            parents, actions, boards, rewards, values = self.expand(boards, rewards, pieces[ply], next_key)
+            roots = actions if ply == 0 else roots[parents]
+            if len(values) == 0:
+                return roots, values
+            if ply + 1 < depth and len(values) > self.beam_width:
+                keep = np.argpartition(-values, self.beam_width)[:self.beam_width]
+                roots, boards, rewards, values = roots[keep], boards[keep], rewards[keep], values[keep]
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+        if depth > len(pieces):
+            # The piece after the preview is unknown: average each node's best placement over all shapes
+            expected = np.zeros(len(boards), dtype=np.float32)
+            for key in TetrisEnv.SHAPES:
+                parents, _, _, _, child_values = self.expand(boards, rewards, key, None)
+                best = np.full(len(boards), -np.inf, dtype=np.float32)
+                np.maximum.at(best, parents, child_values)
+                expected += best / len(TetrisEnv.SHAPES)
+                if deadline is not None and time.perf_counter() > deadline:
+                    return None
+            values = expected
+        return roots, values
+
+    def plan(self, env):
+        '''
+        Returns the placement action for env's current piece, or None if no placement fits.
+        '''
+        start = time.perf_counter()
+        grid = np.array(env.locked_grid, dtype=bool)
+        pieces = (env.current_piece.shape_key, env.next_piece.shape_key)
+        action = None
+        if self.time_budget is None:
+            depths, deadline = [self.depth], None
+        else:
+            depths, deadline = range(1, self.depth + 1), start + self.time_budget
+        for depth in depths:
+            result = self.search(grid, pieces, depth, deadline if depth > 1 else None)
+            if result is None:
+                break
+            roots, values = result
+            if len(values) == 0:
+                break
+            action = int(roots[values.argmax()])
+        self.moves += 1
+        self.search_time += time.perf_counter() - start
+        return action
+
+    def stats(self):
+        return {
+            'moves': self.moves,
+            'nodes': self.nodes,
+            'nodes_per_sec': self.nodes / self.search_time if self.search_time else 0.0,
+            'ms_per_move': 1000 * self.search_time / self.moves if self.moves else 0.0,
+            'cache_hit_rate': self.cache_hits / self.cache_lookups if self.cache_lookups else 0.0,
+            'cache_entries': len(self.cache),
+        }
+
+def play(planner, env, max_pieces=None, recorder=None):
+    '''
+    Plays one game of a placement-mode env with the planner. Returns (lines cleared, pieces placed).
+    '''
+    state = env.reset()
+    if recorder is not None:
+        recorder.reset(state, env.current_piece.shape_key)
+    pieces = 0
+    done = False
+    while not done and (max_pieces is None or pieces < max_pieces):
+        action = planner.plan(env)
+        if action is None:
+            break
+        state, reward, done = env.step(action)
+        if recorder is not None:
+            recorder.step(action, reward, state, done, env.current_piece.shape_key)
+        pieces += 1
+    if recorder is not None and not done:
+        recorder.end_episode()
+    return env.lines_cleared, pieces
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play TetrisEnv with the beam-search planner.")
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--beam', type=int, default=32, help="Nodes kept per ply")
+    parser.add_argument('--depth', type=int, default=2, help="Plies: 1 current piece, 2 with preview, 3 plus one unknown piece")
+    parser.add_argument('--budget', type=float, default=None, help="Seconds per move (iterative deepening)")
+    parser.add_argument('--cache-size', type=int, default=200000)
+    parser.add_argument('--max-pieces', type=int, default=None, help="Stop a game after this many pieces")
+    parser.add_argument('--model', default=None, help="Evaluate boards with this Keras Q-model instead of the heuristic")
+    parser.add_argument('--weights', default=None, help="Heuristic weight file, e.g. from cem.py")
+    parser.add_argument('--record', default=None, help="Directory to append the played games to")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        import random
+        random.seed(args.seed)
+    evaluator = None
+    if args.weights:
+        evaluator = HeuristicEvaluator.load(args.weights)
+    if args.model:
+        import tensorflow as tf
+        evaluator = ModelEvaluator(tf.keras.models.load_model(args.model))
+    planner = BeamPlanner(evaluator, beam_width=args.beam, depth=args.depth, time_budget=args.budget, cache_size=args.cache_size)
+    recorder = None
+    if args.record:
+        from trajectory_store import TrajectoryRecorder
+        recorder = TrajectoryRecorder(args.record)
+    env = TetrisEnv(action_mode='placement')
+    for game in range(args.games):
+        lines, pieces = play(planner, env, args.max_pieces, recorder)
+        stats = planner.stats()
+        print(f"Game {game + 1}: lines {lines}, pieces {pieces}, {stats['nodes_per_sec']:.0f} nodes/s, "
+              f"{stats['ms_per_move']:.1f} ms/move, cache hit rate {stats['cache_hit_rate']:.1%}")
+    if recorder is not None:
+        recorder.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import numpy as np
+
+def _layers(weights):
+    return [(weights[i], weights[i + 1]) for i in range(0, len(weights), 2)]
+
+def export_numpy(model_or_weights, path, dtype='float32'):
+    '''
+    Writes the Dense kernels and biases of a model.py Q-network (or a get_weights() list) to an .npz file.
+    dtype 'float16' halves the kernels; 'int8' stores them with one symmetric scale per output unit.
+    Biases stay float32.
+    '''
+    weights = model_or_weights.get_weights() if hasattr(model_or_weights, 'get_weights') else model_or_weights
+    arrays = {'dtype': np.array(dtype)}
+    for i, (kernel, bias) in enumerate(_layers(weights)):
+        if dtype == 'int8':
+            scale = np.abs(kernel).max(axis=0) / 127
+            scale[scale == 0] = 1
+            arrays[f'kernel_{i}'] = np.round(kernel / scale).astype(np.int8)
+            arrays[f'scale_{i}'] = scale.astype(np.float32)
+        elif dtype in ('float16', 'float32'):
+            arrays[f'kernel_{i}'] = kernel.astype(dtype)
+        else:
+            raise ValueError(f"Unknown dtype: {dtype}")
+        arrays[f'bias_{i}'] = bias.astype(np.float32)
+    np.savez(path, **arrays)
+
+class NumpyPolicy:
+    '''
+    Dependency-free forward pass of the Q-network: Dense + ReLU layers and a linear output layer.
+    Quantized kernels are expanded to float32 once at load time, so inference is one matmul per layer.
+    '''
+    def __init__(self, weights):
+        self.set_weights(weights)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            weights = []
+            i = 0
+            while f'kernel_{i}' in data:
+                kernel = data[f'kernel_{i}'].astype(np.float32)
+                if f'scale_{i}' in data:
+                    kernel *= data[f'scale_{i}']
+                weights += [kernel, data[f'bias_{i}']]
+                i += 1
+        return cls(weights)
+
+    def set_weights(self, weights):
+        '''
+        Takes a model.get_weights() list; used to pick up weights published by a learner.
+        '''
+        self.layers = [(np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32))
+                       for kernel, bias in _layers(weights)]
+
+    def q_values(self, states):
+        x = np.asarray(states, dtype=np.float32)
+        x = x.reshape(-1, self.layers[0][0].shape[0])
+        for kernel, bias in self.layers[:-1]:
+            x = x @ kernel
+            x += bias
+            np.maximum(x, 0, out=x)
+        kernel, bias = self.layers[-1]
+        return x @ kernel + bias
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(state)[0]))
+
+def export_tflite(model, path, quantize=False):
+    '''
+    Converts the Keras model to a TFLite flatbuffer; quantize=True applies dynamic-range (int8 weight) quantization.
+    '''
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+class TFLitePolicy:
+    '''
+    Runs an exported .tflite model with the tflite_runtime interpreter, or TensorFlow's if that is not installed.
+    '''
+    def __init__(self, path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = None
+
+    def q_values(self, states):
+        states = np.asarray(states, dtype=np.float32).reshape(-1, self.input['shape'][-1])
+        if len(states) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input['index'], states.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(states)
+        self.interpreter.set_tensor(self.input['index'], states)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output['index'])
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(state)[0]))
+
+def sample_states(count, seed=0):
+    '''
+    Observations from random TetrisEnv play, flattened, for checking exported policies.
+    '''
+    import random
+    from tetris_env import TetrisEnv
+    random.seed(seed)
+    env = TetrisEnv()
+    states = [env.get_state().reshape(-1)]
+    while len(states) < count:
+        state, _, done = env.step(random.randrange(env.action_space))
+        states.append(env.reset().reshape(-1) if done else state.reshape(-1))
+    return np.array(states)
+
+def compare(model, policy, states):
+    '''
+    Returns (max absolute Q-value difference, fraction of states with the same greedy action) against the Keras model.
+    '''
+    expected = model(states, training=False).numpy()
+    got = policy.q_values(states)
+    return float(np.abs(expected - got).max()), float((expected.argmax(axis=1) == got.argmax(axis=1)).mean())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a trained Q-model for TensorFlow-free inference and check it against Keras.")
+    parser.add_argument('model', help="Keras model saved by model.py --save")
+    parser.add_argument('--out', default='policy.npz', help="NumPy weight file to write")
+    parser.add_argument('--dtype', choices=['float32', 'float16', 'int8'], default='float32')
+    parser.add_argument('--tflite', default=None, help="Also write a .tflite model here")
+    parser.add_argument('--quantize-tflite', action='store_true')
+    parser.add_argument('--atol', type=float, default=None, help="Fail if any Q-value differs by more than this")
+    parser.add_argument('--states', type=int, default=2000, help="Env states used for the check")
+    args = parser.parse_args(argv)
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model)
+    states = sample_states(args.states)
+    export_numpy(model, args.out, args.dtype)
+    checks = [(args.out, NumpyPolicy.load(args.out))]
+    if args.tflite:
+        export_tflite(model, args.tflite, args.quantize_tflite)
+        checks.append((args.tflite, TFLitePolicy(args.tflite)))
+    failed = False
+    for path, policy in checks:
+        error, agreement = compare(model, policy, states)
+        print(f"{path}: max |dQ| {error:.3g}, greedy action agreement {agreement:.2%}")
+        failed |= args.atol is not None and error > args.atol
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
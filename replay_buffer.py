@@ -0,0 +1,295 @@
+import numpy as np
+
+class ReplayBuffer:
+    '''
+    Fixed-capacity replay memory backed by preallocated NumPy arrays.
+    Binary board planes are stored bit-packed (2x20x10 -> 50 bytes). States live in one ring of
+    slots: transition i is (state[i], action[i], reward[i], state[i + 1], done[i]), so when a
+    transition starts from the previous one's next_state that state is only stored once.
+    A new episode leaves the previous terminal next_state behind as a slot with no transition.
+    '''
+    def __init__(self, capacity, state_shape=(2, 20, 10), seed=None):
+        self.capacity = capacity
+        self.state_shape = tuple(state_shape)
+        self.state_size = int(np.prod(self.state_shape))
+        self.packed_size = (self.state_size + 7) // 8
+        self.states = np.zeros((capacity, self.packed_size), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.valid = np.zeros(capacity, dtype=bool)  # Slot holds a transition whose next state is the following slot
+        self.rng = np.random.default_rng(seed)
+        self.pos = 0  # Slot of the most recent next_state
+        self.filled = 0  # Number of slots written at least once
+        self.size = 0  # Number of valid transitions
+        self.pending = False
+
+    def __len__(self):
+        return self.size
+
+    def pack(self, state):
+        return np.packbits(np.asarray(state).reshape(-1) != 0)
+
+    def _write_slot(self, i, packed):
+        if self.valid[i]:
+            self.valid[i] = False
+            self.size -= 1
+        self.states[i] = packed
+        self.filled = max(self.filled, i + 1)
+
+    def add(self, state, action, reward, next_state, done):
+        self.add_packed(self.pack(state), action, reward, self.pack(next_state), done)
+
+    def add_packed(self, packed, action, reward, next_packed, done):
+        '''
+        Adds a transition whose states are already bit-packed with pack().
+        '''
+        if self.pending and np.array_equal(self.states[self.pos], packed):
+            i = self.pos
+        else:
+            i = (self.pos + 1) % self.capacity if self.pending else self.pos
+            self._write_slot(i, packed)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.valid[i] = True
+        self.size += 1
+        j = (i + 1) % self.capacity
+        self._write_slot(j, next_packed)
+        self.pos = j
+        self.pending = True
+
+    def _write_slots(self, idx, packed):
+        '''
+        Vectorized _write_slot for distinct slots.
+        '''
+        overwritten = self.valid[idx]
+        self.size -= int(overwritten.sum())
+        self.valid[idx] = False
+        self.states[idx] = packed
+        self.filled = max(self.filled, int(idx.max()) + 1)
+        return idx[overwritten]
+
+    def add_packed_batch(self, packed, actions, rewards, next_packed, dones):
+        '''
+        Adds a block of consecutive bit-packed transitions, as add_packed() one at a time would, with
+        slice assignments: a state equal to the previous transition's next_state shares its slot.
+        Returns the slots of the added transitions.
+        '''
+        n = len(actions)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        chained = np.empty(n, dtype=bool)
+        chained[0] = self.pending and np.array_equal(self.states[self.pos], packed[0])
+        chained[1:] = (next_packed[:-1] == packed[1:]).all(axis=1)
+        new_slots = 2 - chained
+        if new_slots.sum() + chained[0] > self.capacity:
+            # The block laps the ring (counting a first state shared with the buffer): later transitions
+            # overwrite earlier ones, so keep the sequential order
+            idx = []
+            for i in range(n):
+                self.add_packed(packed[i], actions[i], rewards[i], next_packed[i], dones[i])
+                idx.append((self.pos - 1) % self.capacity)
+            idx = np.unique(idx)
+            return idx[self.valid[idx]]
+        start = self.pos + 1 if self.pending else self.pos
+        next_idx = (start + np.cumsum(new_slots) - 1) % self.capacity
+        idx = (next_idx - 1) % self.capacity
+        fresh = ~chained
+        self._write_slots(np.concatenate([idx[fresh], next_idx]), np.concatenate([packed[fresh], next_packed]))
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.dones[idx] = dones
+        self.valid[idx] = True
+        self.size += n
+        self.pos = int(next_idx[-1])
+        self.pending = True
+        return idx
+
+    def sample_indices(self, batch_size):
+        '''
+        Draws `batch_size` valid transition slots uniformly (with replacement), by rejection.
+        '''
+        idx = self.rng.integers(0, self.filled, batch_size)
+        bad = ~self.valid[idx]
+        while bad.any():
+            idx[bad] = self.rng.integers(0, self.filled, int(bad.sum()))
+            bad = ~self.valid[idx]
+        return idx
+
+    def unpack(self, packed):
+        '''
+        Unpacks a (B, packed_size) array into flat float32 states of shape (B, state_size).
+        '''
+        return np.unpackbits(packed, axis=1, count=self.state_size).astype(np.float32)
+
+    def get(self, idx):
+        '''
+        Returns the transitions at the given slots as contiguous arrays
+        (states, actions, rewards, next_states, dones); states are flat float32.
+        '''
+        next_idx = (idx + 1) % self.capacity
+        return (self.unpack(self.states[idx]), self.actions[idx], self.rewards[idx],
+                self.unpack(self.states[next_idx]), self.dones[idx].astype(np.float32))
+
+    def sample(self, batch_size):
+        return self.get(self.sample_indices(batch_size))
+
+    def state_dict(self):
+        '''
+        Copies the written part of the buffer and its counters into ({name: array}, {name: JSON-able value}),
+        so a checkpoint can be written while the buffer keeps changing.
+        '''
+        n = self.filled
+        arrays = {'states': self.states[:n].copy(), 'actions': self.actions[:n].copy(), 'rewards': self.rewards[:n].copy(),
+                  'dones': self.dones[:n].copy(), 'valid': self.valid[:n].copy()}
+        scalars = {'capacity': self.capacity, 'pos': self.pos, 'filled': self.filled, 'size': self.size,
+                   'pending': self.pending, 'rng': self.rng.bit_generator.state}
+        return arrays, scalars
+
+    def load_state_dict(self, arrays, scalars):
+        if scalars['capacity'] != self.capacity:
+            raise ValueError(f"Checkpoint replay capacity {scalars['capacity']} does not match {self.capacity}")
+        n = scalars['filled']
+        for name in ('states', 'actions', 'rewards', 'dones', 'valid'):
+            getattr(self, name)[:n] = arrays[name]
+        self.pos, self.filled, self.size, self.pending = scalars['pos'], n, scalars['size'], scalars['pending']
+        self.rng.bit_generator.state = scalars['rng']
+
+class SumTree:
+    '''
+    Array-based binary sum-tree with a parallel min-tree over `capacity` leaf priorities.
+    Node 1 is the root and the leaves start at `size`; batched lookups and updates walk all
+    paths one level at a time, so each costs O(log n) vectorized steps.
+    '''
+    def __init__(self, capacity):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.depth = self.size.bit_length() - 1
+        self.sums = np.zeros(2 * self.size, dtype=np.float64)
+        self.mins = np.full(2 * self.size, np.inf, dtype=np.float64)
+
+    def total(self):
+        return self.sums[1]
+
+    def min(self):
+        return self.mins[1]
+
+    def update(self, idx, priorities):
+        '''
+        Sets the priorities of the given leaves; a priority of 0 removes a leaf from sampling.
+        '''
+        idx, last = np.unique(np.asarray(idx)[::-1], return_index=True)  # Last write wins for duplicates
+        priorities = np.asarray(priorities, dtype=np.float64)[::-1][last]
+        nodes = idx + self.size
+        self.sums[nodes] = priorities
+        self.mins[nodes] = np.where(priorities > 0, priorities, np.inf)
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.sums[nodes] = self.sums[2 * nodes] + self.sums[2 * nodes + 1]
+            self.mins[nodes] = np.minimum(self.mins[2 * nodes], self.mins[2 * nodes + 1])
+
+    def find(self, values):
+        '''
+        Returns, for each value in [0, total), the leaf whose prefix-sum interval contains it.
+        '''
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values >= self.sums[left]
+            values = np.where(go_right, values - self.sums[left], values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.size
+
+    def get(self, idx):
+        return self.sums[np.asarray(idx) + self.size]
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    '''
+    ReplayBuffer that samples transitions in proportion to priority ** alpha using a SumTree, and
+    returns importance-sampling weights whose exponent beta is annealed from `beta` to 1 over
+    `beta_steps` sample calls. New transitions get the current maximum priority.
+    '''
+    def __init__(self, capacity, state_shape=(2, 20, 10), alpha=0.6, beta=0.4, beta_steps=100000, epsilon=1e-6, seed=None):
+        super().__init__(capacity, state_shape, seed)
+        self.alpha = alpha
+        self.beta_start = beta
+        self.beta = beta
+        self.beta_steps = beta_steps
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.sample_calls = 0
+        self.tree = SumTree(capacity)
+
+    def _write_slot(self, i, packed):
+        if self.valid[i]:
+            self.tree.update([i], [0.0])
+        super()._write_slot(i, packed)
+
+    def add_packed(self, packed, action, reward, next_packed, done):
+        super().add_packed(packed, action, reward, next_packed, done)
+        i = (self.pos - 1) % self.capacity
+        self.tree.update([i], [self.max_priority ** self.alpha])
+
+    def _write_slots(self, idx, packed):
+        overwritten = super()._write_slots(idx, packed)
+        if len(overwritten):
+            self.tree.update(overwritten, np.zeros(len(overwritten)))
+        return overwritten
+
+    def add_packed_batch(self, packed, actions, rewards, next_packed, dones):
+        idx = super().add_packed_batch(packed, actions, rewards, next_packed, dones)
+        if len(idx):
+            self.tree.update(idx, np.full(len(idx), self.max_priority ** self.alpha))
+        return idx
+
+    def sample_indices(self, batch_size):
+        '''
+        Stratified proportional sampling: one draw from each of `batch_size` equal slices of the total priority.
+        '''
+        total = self.tree.total()
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        idx = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        # Guard against float round-off landing on a zero-priority leaf
+        bad = self.tree.get(idx) <= 0
+        if bad.any():
+            idx[bad] = super().sample_indices(int(bad.sum()))
+        return idx
+
+    def weights(self, idx):
+        '''
+        Importance-sampling weights (N * P(i)) ** -beta, normalized by the largest possible weight.
+        '''
+        total = self.tree.total()
+        probs = self.tree.get(idx) / total
+        max_weight = (self.size * self.tree.min() / total) ** -self.beta
+        return ((self.size * probs) ** -self.beta / max_weight).astype(np.float32)
+
+    def sample(self, batch_size):
+        '''
+        Returns (states, actions, rewards, next_states, dones, idx, weights) and advances the beta schedule.
+        '''
+        idx = self.sample_indices(batch_size)
+        weights = self.weights(idx)
+        self.sample_calls += 1
+        self.beta = min(1.0, self.beta_start + (1.0 - self.beta_start) * self.sample_calls / self.beta_steps)
+        return self.get(idx) + (idx, weights)
+
+    def state_dict(self):
+        arrays, scalars = super().state_dict()
+        arrays['priorities'] = self.tree.get(np.arange(self.filled))
+        scalars.update(beta=self.beta, max_priority=self.max_priority, sample_calls=self.sample_calls)
+        return arrays, scalars
+
+    def load_state_dict(self, arrays, scalars):
+        super().load_state_dict(arrays, scalars)
+        self.tree = SumTree(self.capacity)
+        self.tree.update(np.arange(self.filled), arrays['priorities'])
+        self.beta, self.max_priority, self.sample_calls = scalars['beta'], scalars['max_priority'], scalars['sample_calls']
+
+    def update_priorities(self, idx, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(idx, priorities ** self.alpha)
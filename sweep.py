@@ -0,0 +1,309 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sqlite3
+import time
+import traceback
+import numpy as np
+
+# Hyperparameters model.py hard-codes by default; values are lists (grid / choice) or distributions
+DEFAULT_SPACE = {
+    'epsilon_decay': [0.99, 0.995, 0.999],
+    'batch_size': [32, 64, 128],
+    'gamma': [0.95, 0.99],
+    'memory_size': [100000, 1000000],
+    'hidden': [[64, 64], [128, 128], [256, 256]],
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY, sweep TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,
+    episodes INTEGER NOT NULL DEFAULT 0, score REAL, cores TEXT, started REAL, finished REAL, error TEXT);
+CREATE TABLE IF NOT EXISTS episodes (
+    trial INTEGER NOT NULL, episode INTEGER NOT NULL, score REAL, lines INTEGER, steps INTEGER, epsilon REAL,
+    updates INTEGER, seconds REAL, PRIMARY KEY (trial, episode));
+CREATE TABLE IF NOT EXISTS rungs (
+    sweep TEXT NOT NULL, rung INTEGER NOT NULL, trial INTEGER NOT NULL, episodes INTEGER, score REAL, lines REAL,
+    steps REAL, PRIMARY KEY (sweep, rung, trial));
+'''
+
+def connect(path):
+    '''
+    Opens the results store, creating its tables. WAL mode lets trial processes write while others read.
+    '''
+    db = sqlite3.connect(path, timeout=60, isolation_level=None)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.executescript(SCHEMA)
+    return db
+
+def sample(spec, rng):
+    '''
+    Draws one value from a search-space entry: a list (uniform choice) or {"choice": [...]},
+    {"uniform": [lo, hi]}, {"log_uniform": [lo, hi]} or {"int_uniform": [lo, hi]} (inclusive).
+    '''
+    if isinstance(spec, list):
+        return spec[rng.integers(len(spec))]
+    (kind, args), = spec.items()
+    if kind == 'choice':
+        return args[rng.integers(len(args))]
+    if kind == 'uniform':
+        return float(rng.uniform(*args))
+    if kind == 'log_uniform':
+        return float(math.exp(rng.uniform(math.log(args[0]), math.log(args[1]))))
+    if kind == 'int_uniform':
+        return int(rng.integers(args[0], args[1] + 1))
+    raise ValueError(f"Unknown distribution: {kind}")
+
+def configurations(space, mode='grid', trials=None, seed=0):
+    '''
+    Trial parameter dicts: the full grid (every entry a list), optionally a random subset of `trials`
+    of it, or `trials` random draws from the space.
+    '''
+    if mode == 'grid':
+        for name, values in space.items():
+            if not isinstance(values, list):
+                raise ValueError(f"Grid search needs a list of values for {name}")
+        names = list(space)
+        grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+        if trials is not None and trials < len(grid):
+            order = np.random.default_rng(seed).permutation(len(grid))[:trials]
+            grid = [grid[i] for i in sorted(order)]
+        return grid
+    if mode == 'random':
+        rng = np.random.default_rng(seed)
+        return [{name: sample(spec, rng) for name, spec in space.items()} for _ in range(trials or 20)]
+    raise ValueError(f"Unknown search mode: {mode}")
+
+def rungs(min_episodes, max_episodes, eta):
+    '''
+    Episode counts at which successive halving compares trials: min_episodes * eta ** k, then max_episodes.
+    '''
+    points = []
+    episodes = min_episodes
+    while episodes < max_episodes:
+        points.append(episodes)
+        episodes *= eta
+    return points + [max_episodes]
+
+def promote(db, sweep, rung, trial, episodes, score, lines, steps, eta):
+    '''
+    Records a trial's rolling score, lines and steps at a rung and decides whether it goes on
+    (asynchronous successive halving): it continues if it is among the top ceil(n / eta) of the n trials
+    recorded at this rung so far. Trials are ranked by score, then lines, then steps, then earliest
+    trial, so tied trials (early DQN scores are mostly 0) do not all get through.
+    '''
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute('INSERT OR REPLACE INTO rungs VALUES (?, ?, ?, ?, ?, ?, ?)', (sweep, rung, trial, episodes, score, lines, steps))
+        ranking = [row[0] for row in db.execute('SELECT trial FROM rungs WHERE sweep = ? AND rung = ? '
+                                                'ORDER BY score DESC, lines DESC, steps DESC, trial', (sweep, rung))]
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    return ranking.index(trial) < math.ceil(len(ranking) / eta)
+
+def _thread_env(threads):
+    '''
+    Sizes the BLAS, OpenMP and TensorFlow thread pools of processes started from now on. Set in the
+    parent: a spawned trial imports NumPy (through this module) before run_trial gets to run.
+    '''
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[name] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+def _log_episodes(db, rows):
+    with db:
+        db.execute('BEGIN')
+        db.executemany('INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+def run_trial(db_path, sweep, trial, params, cores, rung_episodes, eta, window, seed, flush_every=10):
+    '''
+    Trains one DQNTrainer with `params` in this process, pinned to `cores`, writing every episode to
+    the store and checking the rolling means over the last `window` episodes at each rung.
+    '''
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    import random
+    import tensorflow as tf
+    from model import DQNTrainer
+    from tetris_env import TetrisEnv
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+    db = connect(db_path)
+    db.execute('UPDATE trials SET status = ?, cores = ?, started = ?, episodes = 0, score = NULL, error = NULL WHERE id = ?',
+               ('running', ','.join(map(str, cores)), time.time(), trial))
+    db.execute('DELETE FROM episodes WHERE trial = ?', (trial,))
+    db.execute('DELETE FROM rungs WHERE trial = ?', (trial,))
+    try:
+        kwargs = dict(params)
+        if 'hidden' in kwargs:
+            kwargs['hidden'] = tuple(kwargs['hidden'])
+        trainer = DQNTrainer(env=TetrisEnv(seed=seed), **kwargs)
+        scores, lines, lengths = [], [], []
+        rows = []
+        status = 'completed'
+        for rung, episodes in enumerate(rung_episodes):
+            while trainer.episode < episodes:
+                start = time.perf_counter()
+                score, steps = trainer.run_episode()
+                scores.append(score)
+                lines.append(trainer.env.lines_cleared)
+                lengths.append(steps)
+                rows.append((trial, trainer.episode, score, trainer.env.lines_cleared, steps, trainer.epsilon, trainer.updates,
+                             time.perf_counter() - start))
+                if len(rows) >= flush_every:
+                    _log_episodes(db, rows)
+                    rows = []
+            _log_episodes(db, rows)
+            rows = []
+            rolling = float(np.mean(scores[-window:]))
+            db.execute('UPDATE trials SET episodes = ?, score = ? WHERE id = ?', (trainer.episode, rolling, trial))
+            if rung + 1 < len(rung_episodes) and not promote(db, sweep, rung, trial, trainer.episode, rolling,
+                                                             float(np.mean(lines[-window:])),
+                                                             float(np.mean(lengths[-window:])), eta):
+                status = 'stopped'
+                break
+        db.execute('UPDATE trials SET status = ?, finished = ? WHERE id = ?', (status, time.time(), trial))
+    except BaseException:
+        db.execute('UPDATE trials SET status = ?, finished = ?, error = ? WHERE id = ?',
+                   ('failed', time.time(), traceback.format_exc(), trial))
+        raise
+    finally:
+        db.close()
+
+def core_slots(cores_per_trial, cores=None):
+    '''
+    Splits the usable cores into disjoint groups of `cores_per_trial`, one per concurrent trial.
+    '''
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    slots = [cores[i:i + cores_per_trial] for i in range(0, len(cores) - cores_per_trial + 1, cores_per_trial)]
+    if not slots:
+        raise ValueError(f"Need at least {cores_per_trial} cores, have {len(cores)}")
+    return slots
+
+class Sweep:
+    '''
+    Runs a hyperparameter sweep of model.DQNTrainer: every configuration is a trial trained in its own
+    process (spawned, so each loads TensorFlow itself), with up to one trial per group of
+    `cores_per_trial` cores, each pinned to its group. Learning curves, rung scores and trial status go
+    to the SQLite store at `db_path` under the sweep `name`. Trials are cut off by asynchronous
+    successive halving: at rungs of min_episodes * eta ** k episodes a trial continues only if its rolling
+    score ranks in the top 1/eta at that rung (see promote()), and survivors run to max_episodes. Re-running a sweep
+    picks up its unfinished trials; ones that were running restart from scratch.
+    '''
+    def __init__(self, db_path, name, configs=None, min_episodes=50, max_episodes=800, eta=3, window=20,
+                 cores_per_trial=1, seed=0, cores=None):
+        self.db_path = db_path
+        self.name = name
+        self.rung_episodes = rungs(min_episodes, max_episodes, eta)
+        self.eta = eta
+        self.window = window
+        self.seed = seed
+        self.slots = core_slots(cores_per_trial, cores)
+        db = connect(db_path)
+        try:
+            if configs is not None and not db.execute('SELECT 1 FROM trials WHERE sweep = ?', (name,)).fetchone():
+                for params in configs:
+                    db.execute('INSERT INTO trials (sweep, params, status) VALUES (?, ?, ?)', (name, json.dumps(params), 'pending'))
+            db.execute('UPDATE trials SET status = ? WHERE sweep = ? AND status = ?', ('pending', name, 'running'))
+        finally:
+            db.close()
+
+    def run(self, log=True):
+        db = connect(self.db_path)
+        pending = db.execute('SELECT id, params FROM trials WHERE sweep = ? AND status = ? ORDER BY id',
+                             (self.name, 'pending')).fetchall()
+        context = mp.get_context('spawn')
+        running = {}  # slot -> (process, trial)
+        free = list(range(len(self.slots)))
+        try:
+            while pending or running:
+                while pending and free:
+                    trial, params = pending.pop(0)
+                    slot = free.pop(0)
+                    process = context.Process(target=run_trial, args=(
+                        self.db_path, self.name, trial, json.loads(params), self.slots[slot], self.rung_episodes,
+                        self.eta, self.window, self.seed + trial))
+                    _thread_env(len(self.slots[slot]))
+                    process.start()
+                    running[slot] = (process, trial)
+                    if log:
+                        print(f"Trial {trial} started on cores {self.slots[slot]}: {params}")
+                time.sleep(1.0)
+                for slot, (process, trial) in list(running.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    del running[slot]
+                    free.append(slot)
+                    if process.exitcode != 0:
+                        # Killed or crashed without reaching run_trial's handler (OOM kill, segfault)
+                        db.execute('UPDATE trials SET status = ?, finished = ?, error = ? WHERE id = ? AND status IN (?, ?)',
+                                   ('failed', time.time(), f"Trial process exited with code {process.exitcode}", trial,
+                                    'pending', 'running'))
+                    if log:
+                        status, episodes, score = db.execute('SELECT status, episodes, score FROM trials WHERE id = ?',
+                                                             (trial,)).fetchone()
+                        score = 'n/a' if score is None else f"{score:.1f}"
+                        print(f"Trial {trial} {status} after {episodes} episodes, rolling score {score}")
+        finally:
+            for process, trial in running.values():
+                process.terminate()
+                process.join()
+                db.execute('UPDATE trials SET status = ? WHERE id = ? AND status = ?', ('pending', trial, 'running'))
+            db.close()
+        return self.results()
+
+    def results(self):
+        '''
+        Trials of this sweep, best rolling score first: [{'id', 'params', 'status', 'episodes', 'score'}].
+        '''
+        db = connect(self.db_path)
+        try:
+            rows = db.execute('SELECT id, params, status, episodes, score FROM trials WHERE sweep = ? '
+                              'ORDER BY episodes DESC, score DESC', (self.name,)).fetchall()
+        finally:
+            db.close()
+        return [{'id': trial, 'params': json.loads(params), 'status': status, 'episodes': episodes, 'score': score}
+                for trial, params, status, episodes, score in rows]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep DQN hyperparameters with parallel trials and successive halving.")
+    parser.add_argument('--space', default=None, help="JSON search space {name: [values] or {distribution: args}}; defaults to DEFAULT_SPACE")
+    parser.add_argument('--mode', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--trials', type=int, default=None, help="Random draws, or a random subset of the grid")
+    parser.add_argument('--name', default='sweep', help="Sweep name in the store; re-running resumes it")
+    parser.add_argument('--db', default='sweep.db', help="SQLite results store")
+    parser.add_argument('--min-episodes', type=int, default=50, help="Episodes before the first successive-halving rung")
+    parser.add_argument('--max-episodes', type=int, default=800, help="Episodes for trials that survive every rung")
+    parser.add_argument('--eta', type=int, default=3, help="Keep the top 1/eta of trials at each rung")
+    parser.add_argument('--window', type=int, default=20, help="Episodes in the rolling score")
+    parser.add_argument('--cores-per-trial', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10, help="Trials to list at the end")
+    args = parser.parse_args(argv)
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    sweep = Sweep(args.db, args.name, configurations(space, args.mode, args.trials, args.seed), args.min_episodes,
+                  args.max_episodes, args.eta, args.window, args.cores_per_trial, args.seed)
+    print(f"Sweep {args.name}: rungs at {sweep.rung_episodes} episodes, {len(sweep.slots)} concurrent trials")
+    results = sweep.run()
+    for result in results[:args.top]:
+        score = 'n/a' if result['score'] is None else f"{result['score']:.1f}"
+        print(f"Trial {result['id']} ({result['status']}, {result['episodes']} episodes): score {score}  {result['params']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,128 @@
 import pygame as pg
-import random
+import argparse
+import time
+from pieces import PieceGenerator
+
+SHAPES = {
+    # Dictionary of all Tetris shapes and their colors
+    'I': {
+        'shape': [
+            [(0,1), (1,1), (2,1), (3,1)],
+            [(2,0), (2,1), (2,2), (2,3)]
+        ],
+        'color': (0, 255, 255)
+    },
+    'O': {
+        'shape': [
+            [(1,0), (2,0), (1,1), (2,1)]
+        ],
+        'color': (255, 255, 0)
+    },
+    'T': {
+        'shape': [
+            [(1,0), (0,1), (1,1), (2,1)],
+            [(1,0), (1,1), (2,1), (1,2)],
+            [(0,1), (1,1), (2,1), (1,2)],
+            [(1,0), (0,1), (1,1), (1,2)]
+        ],
+        'color': (128, 0, 128)
+    },
+    'S': {
+        'shape': [
+            [(1,0), (2,0), (0,1), (1,1)],
+            [(1,0), (1,1), (2,1), (2,2)]
+        ],
+        'color': (0, 255, 0)
+    },
+    'Z': {
+        'shape': [
+            [(0,0), (1,0), (1,1), (2,1)],
+            [(2,0), (1,1), (2,1), (1,2)]
+        ],
+        'color': (255, 0, 0)
+    },
+    'J': {
+        'shape': [
+            [(0,0), (0,1), (1,1), (2,1)],
+            [(1,0), (2,0), (1,1), (1,2)],
+            [(0,1), (1,1), (2,1), (2,2)],
+            [(1,0), (1,1), (0,2), (1,2)]
+        ],
+        'color': (0, 0, 255)
+    },
+    'L': {
+        'shape': [
+            [(2,0), (0,1), (1,1), (2,1)],
+            [(1,0), (1,1), (1,2), (2,2)],
+            [(0,1), (1,1), (2,1), (0,2)],
+            [(0,0), (1,0), (1,1), (1,2)]
+        ],
+        'color': (255, 165, 0)
+    }
+}
+
+score_dict = {0: 0, 1: 40, 2: 100, 3: 300, 4: 1200}
+
+TICK_RATE = 60  # Simulation ticks per second of game time
 
 class Graphics:
     '''
     Handles all drawing operations for the game window, grid, and pieces.
+    The static background and grid are pre-rendered once and fonts and the score text are cached.
+    With dirty_rects=True, render() redraws only the cells whose color changed since the last frame
+    and pushes just those rectangles with pg.display.update(rects) instead of flipping the whole window.
     '''
-    def __init__(self):
+    def __init__(self, dirty_rects=False):
         self.screen = pg.display.set_mode((800, 1000))  # Set window size (width, height)
         pg.display.set_caption("Tetrus")
-    def background(self):
+        self.cell_size = 40
+        self.dirty_rects = dirty_rects
+        self.static = self.render_background()
+        self.font = pg.font.SysFont(None, 48)
+        self.big_font = pg.font.SysFont(None, 96)
+        self.score_value = None
+        self.score_surface = None
+        self.invalidate()
+
+    def render_background(self):
         '''
-        Draws the background and the grid for the Tetris play area.
+        Renders the background and the grid for the Tetris play area onto an off-screen surface.
         '''
-        self.screen.fill((128, 128, 128))  
-        pg.draw.rect(self.screen, (200, 200, 200), (100, 100, 400, 800))
-        pg.draw.rect(self.screen, (100, 100, 100), (550, 200, 200, 200))
-        cell_size = 40
+        surface = pg.Surface(self.screen.get_size())
+        surface.fill((128, 128, 128))
+        pg.draw.rect(surface, (200, 200, 200), (100, 100, 400, 800))
+        pg.draw.rect(surface, (100, 100, 100), (550, 200, 200, 200))
+        cell_size = self.cell_size
         for x in range(11):  # 10 columns need 11 lines
-            pg.draw.line(self.screen, (100, 100, 100), (100 + x * cell_size, 100), (100 + x * cell_size, 900))
+            pg.draw.line(surface, (100, 100, 100), (100 + x * cell_size, 100), (100 + x * cell_size, 900))
         for y in range(21):  # 20 rows need 21 lines
-            pg.draw.line(self.screen, (100, 100, 100), (100, 100 + y * cell_size), (500, 100 + y * cell_size))   
+            pg.draw.line(surface, (100, 100, 100), (100, 100 + y * cell_size), (500, 100 + y * cell_size))
+        return surface.convert() if pg.display.get_surface() is not None else surface
+
+    def invalidate(self):
+        '''
+        Forgets what is on screen so the next render() redraws the whole window.
+        '''
+        self.drawn_cells = None
+        self.drawn_next = None
+        self.drawn_score = None
+
+    def background(self):
+        '''
+        Draws the background and the grid for the Tetris play area.
+        '''
+        self.screen.blit(self.static, (0, 0))
 
     def draw_piece(self, piece):
         '''
         Draws a Tetris piece on the board at its current position and rotation.
         '''
-        cell_size = 40
+        cell_size = self.cell_size
         for x, y in piece.get_blocks():
             pg.draw.rect(self.screen, piece.color, (100 + x*cell_size, 100 + y*cell_size, cell_size, cell_size))
 
     def draw_locked(self, color_grid):
-        cell_size = 40
+        cell_size = self.cell_size
         for y, row in enumerate(color_grid):
             for x, color in enumerate(row):
                 if color:
@@ -40,7 +132,7 @@ class Graphics:
         '''
         Draws the next piece in the preview area.
         '''
-        cell_size = 40
+        cell_size = self.cell_size
         for x, y in piece.get_blocks():
             pg.draw.rect(self.screen, piece.color, (575 + (x-3)*cell_size, 250 + y*cell_size, cell_size, cell_size))
 
@@ -52,23 +144,93 @@ class Graphics:
         overlay.fill((0, 0, 0, 180))  # Black with alpha for transparency
         self.screen.blit(overlay, (0, 0))
         # Draw the Game Over text
-        font = pg.font.SysFont(None, 96)
-        text = font.render("Game Over", True, (255, 0, 0))
+        text = self.big_font.render("Game Over", True, (255, 0, 0))
         text_rect = text.get_rect(center=(400, 400))
         self.screen.blit(text, text_rect)
         # Draw a smaller instruction
-        font_small = pg.font.SysFont(None, 48)
-        text2 = font_small.render("Press any key to quit", True, (255, 255, 255))
+        text2 = self.font.render("Press any key to quit", True, (255, 255, 255))
         text2_rect = text2.get_rect(center=(400, 500))
         self.screen.blit(text2, text2_rect)
+        self.invalidate()
+
+    def score_text(self, score):
+        '''
+        Returns the rendered score text, re-rendering it only when the score changed.
+        '''
+        if score != self.score_value:
+            self.score_value = score
+            self.score_surface = self.font.render(f"Score: {score}", True, (255, 255, 255))
+        return self.score_surface
 
     def draw_score(self, score):
         '''
         Draws the current score on the screen.
         '''
-        font = pg.font.SysFont(None, 48)
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        self.screen.blit(score_text, (600, 50))
+        self.screen.blit(self.score_text(score), (600, 50))
+
+    def render(self, piece, color_grid, next_piece, score):
+        '''
+        Draws a full frame. In dirty_rects mode only changed cells, the preview and the score are
+        redrawn and only their rectangles are sent to the display.
+        '''
+        if not self.dirty_rects or self.drawn_cells is None:
+            self.background()
+            self.draw_piece(piece)
+            self.draw_locked(color_grid)
+            self.draw_next_piece(next_piece)
+            self.draw_score(score)
+            pg.display.flip()
+            if self.dirty_rects:
+                self.drawn_cells = self.cell_colors(piece, color_grid)
+                self.drawn_next = (next_piece.shape_key, next_piece.rotation)
+                self.drawn_score = self.score_text(score).get_rect(topleft=(600, 50))
+            return
+        rects = []
+        cell_size = self.cell_size
+        cells = self.cell_colors(piece, color_grid)
+        for cell in self.drawn_cells.keys() | cells.keys():
+            color = cells.get(cell)
+            if color != self.drawn_cells.get(cell):
+                rect = pg.Rect(100 + cell[0]*cell_size, 100 + cell[1]*cell_size, cell_size, cell_size)
+                self.screen.blit(self.static, rect, rect)
+                if color:
+                    pg.draw.rect(self.screen, color, rect)
+                rects.append(rect)
+        self.drawn_cells = cells
+        if (next_piece.shape_key, next_piece.rotation) != self.drawn_next:
+            rect = pg.Rect(550, 200, 200, 200)
+            self.screen.blit(self.static, rect, rect)
+            self.draw_next_piece(next_piece)
+            rects.append(rect.union(self.next_piece_rect(next_piece)))
+            self.drawn_next = (next_piece.shape_key, next_piece.rotation)
+        if score != self.score_value:
+            self.screen.blit(self.static, self.drawn_score, self.drawn_score)
+            rect = self.score_text(score).get_rect(topleft=(600, 50))
+            self.screen.blit(self.score_surface, rect)
+            rects.append(rect.union(self.drawn_score))
+            self.drawn_score = rect
+        if rects:
+            pg.display.update(rects)
+
+    def cell_colors(self, piece, color_grid):
+        '''
+        Maps each colored board cell to its color, locked cells drawn over the falling piece.
+        '''
+        cells = {(x, y): piece.color for x, y in piece.get_blocks()}
+        for y, row in enumerate(color_grid):
+            for x, color in enumerate(row):
+                if color:
+                    cells[(x, y)] = color
+        return cells
+
+    def next_piece_rect(self, piece):
+        cell_size = self.cell_size
+        blocks = piece.get_blocks()
+        left = min(575 + (x-3)*cell_size for x, y in blocks)
+        top = min(250 + y*cell_size for x, y in blocks)
+        right = max(575 + (x-2)*cell_size for x, y in blocks)
+        bottom = max(250 + (y+1)*cell_size for x, y in blocks)
+        return pg.Rect(left, top, right - left, bottom - top)
 
 class Piece:
     '''
@@ -106,7 +268,7 @@ class Piece:
                 kicked = False
                 for dx in [-1, 1, -2, 2]:
                     self.x += dx
-                    if not self.collides_with_another_piece(locked_grid) and self.is_within_grid():
+                    if self.is_within_grid() and not self.collides_with_another_piece(locked_grid):
                         kicked = True
                         break
                     self.x -= dx
@@ -114,7 +276,7 @@ class Piece:
                     # Try shifting up (rare, but for completeness)
                     for dy in [-1, -2]:
                         self.y += dy
-                        if not self.collides_with_another_piece(locked_grid) and self.is_within_grid():
+                        if self.is_within_grid() and not self.collides_with_another_piece(locked_grid):
                             kicked = True
                             break
                         self.y -= dy
@@ -157,57 +319,6 @@ class Piece:
                 return True
         return False
 
-def killing(_piece):
-    '''
-    Locks the piece into the grid and returns a new piece.
-    '''
-    global color_grid, locked_grid, next_piece
-    for x, y in _piece.get_blocks():
-        if 0 <= x < 10 and 0 <= y < 20:
-            color_grid[y][x] = _piece.color
-            locked_grid[y][x] = True
-    piece = next_piece
-    next_piece = Piece(random.choice(list(SHAPES.keys())))
-    return piece 
-
-def falling(_piece, fall_time, fall_speed):
-        '''
-        Handles the falling logic for the piece.
-        '''
-        fall_time += 1
-        if fall_time >= fall_speed:
-            _piece.y += 1  # Move piece down
-            fall_time = 0
-            # If piece is out of grid or collides, revert and lock
-            if not _piece.is_within_grid() or _piece.collides_with_another_piece(locked_grid):
-                _piece.y -= 1
-                return killing(_piece), fall_time
-        return _piece, fall_time
-
-def line_check():
-    '''
-    Checks for full lines in locked_grid, removes them, and shifts above lines down in both locked_grid and color_grid.
-    '''
-    global locked_grid, color_grid, score
-    new_locked = []
-    new_color = []
-    for y in range(20):
-        if all(locked_grid[y]):
-            # Skip this row (remove it)
-            continue
-        new_locked.append(locked_grid[y][:])
-        new_color.append(color_grid[y][:])
-    # Count how many lines were removed
-    lines_removed = 20 - len(new_locked)
-    score += score_dict.get(lines_removed)  # Update score based on lines removed
-
-    # Add empty rows at the top
-    for _ in range(lines_removed):
-        new_locked.insert(0, [False]*10)
-        new_color.insert(0, [None]*10)
-    locked_grid = new_locked
-    color_grid = new_color
-
 def check_game_over(piece, locked_grid):
     '''
     Returns True if any block of the given piece would spawn in a locked cell.
@@ -217,178 +328,273 @@ def check_game_over(piece, locked_grid):
             return True
     return False
 
-if __name__ == "__main__":
-    # Main game logic starts here
-    SHAPES = {
-        # Dictionary of all Tetris shapes and their colors
-        'I': {
-            'shape': [
-                [(0,1), (1,1), (2,1), (3,1)],
-                [(2,0), (2,1), (2,2), (2,3)]
-            ],
-            'color': (0, 255, 255)
-        },
-        'O': {
-            'shape': [
-                [(1,0), (2,0), (1,1), (2,1)]
-            ],
-            'color': (255, 255, 0)
-        },
-        'T': {
-            'shape': [
-                [(1,0), (0,1), (1,1), (2,1)],
-                [(1,0), (1,1), (2,1), (1,2)],
-                [(0,1), (1,1), (2,1), (1,2)],
-                [(1,0), (0,1), (1,1), (1,2)]
-            ],
-            'color': (128, 0, 128)
-        },
-        'S': {
-            'shape': [
-                [(1,0), (2,0), (0,1), (1,1)],
-                [(1,0), (1,1), (2,1), (2,2)]
-            ],
-            'color': (0, 255, 0)
-        },
-        'Z': {
-            'shape': [
-                [(0,0), (1,0), (1,1), (2,1)],
-                [(2,0), (1,1), (2,1), (1,2)]
-            ],
-            'color': (255, 0, 0)
-        },
-        'J': {
-            'shape': [
-                [(0,0), (0,1), (1,1), (2,1)],
-                [(1,0), (2,0), (1,1), (1,2)],
-                [(0,1), (1,1), (2,1), (2,2)],
-                [(1,0), (1,1), (0,2), (1,2)]
-            ],
-            'color': (0, 0, 255)
-        },
-        'L': {
-            'shape': [
-                [(2,0), (0,1), (1,1), (2,1)],
-                [(1,0), (1,1), (1,2), (2,2)],
-                [(0,1), (1,1), (2,1), (0,2)],
-                [(0,0), (1,0), (1,1), (1,2)]
-            ],
-            'color': (255, 165, 0)
-        }
-    }
-    
-    #Fall
-    fall_time = 0  # Counter for piece falling
-    fall_speed = 30  # How many frames before the piece falls one cell
-    
-    #Movement
-    move_delay = 30  # Frames between moves when holding a key
-    move_left_counter = 0  # Counter for holding left
-    move_right_counter = 0  # Counter for holding right
-    move_down_counter = 0  # Counter for holding down
-
-
-    #Grids
-    color_grid = [[None for _ in range(10)] for _ in range(20)]
-    locked_grid = [[False for _ in range(10)] for _ in range(20)]
-
-
-    #Locking
-    lock_delay_counter = 0
-    lock_delay_frames = 30  # Number of frames before locking
-
-    #Score
-    score = 0
-    score_dict= {
-        0: 0,
-        1: 40,
-        2: 100, 
-        3: 300, 
-        4: 1200
-        }  
-
-
-    clock = pg.time.Clock()  # Controls the frame rate
-    pg.init()  # Initialize pygame
-    graphics = Graphics()  # Create graphics handler
-    running = True  # Main loop flag
-    current_piece = Piece(random.choice(list(SHAPES.keys())))  # The current falling piece
-    next_piece = Piece(random.choice(list(SHAPES.keys())))  # The next piece to fall
-
-    pg.mixer.init()
-    pg.mixer.music.load("background_music.mp3")  
-    pg.mixer.music.play(-1)
-
-    while running:
-        '''
-        Main game loop:
-        - Handles timing, drawing, piece falling, and input.
-        '''
-        clock.tick(60)  # Limit to 60 FPS
-        graphics.background()   # Draw background and grid
-        graphics.draw_piece(current_piece)  # Draw the current piece
-        graphics.draw_locked(color_grid)  # Draw the locked pieces on the grid
-        graphics.draw_next_piece(next_piece)  # Draw the next piece in the preview area
-        graphics.draw_score(score)  # Draw the current score
-        # Handle falling piece
-        current_piece, fall_time = falling(current_piece, fall_time, fall_speed)
-
-        # --- GAME OVER OVERLAY ---
- 
-        if check_game_over(current_piece, locked_grid):
-            graphics.draw_game_over_overlay()
-            pg.display.flip()
-            waiting = True
-            while waiting:
-                for event in pg.event.get():
-                    if event.type == pg.QUIT or event.type == pg.KEYDOWN:
-                        waiting = False
-            running = False
-            continue
-
-        # --- INPUT HANDLING ---
-        keys = pg.key.get_pressed()
-        # Left movement (tricky: only move once per delay interval)
-        if keys[pg.K_LEFT] or keys[pg.K_q]:
-            move_left_counter += 1
-            if move_left_counter == 1 or move_left_counter > move_delay:
-                current_piece.x -= 1  # Only move if delay threshold met
-                if not current_piece.is_within_grid() or current_piece.collides_with_another_piece(locked_grid):
-                    current_piece.x += 1
-        else:
-            move_left_counter = 0
-
-        # Right movement (tricky: only move once per delay interval)
-        if keys[pg.K_RIGHT] or keys[pg.K_d]:
-            move_right_counter += 1
-            if move_right_counter == 1 or move_right_counter > move_delay:
-                current_piece.x += 1
-                if not current_piece.is_within_grid() or current_piece.collides_with_another_piece(locked_grid):
-                    current_piece.x -= 1
-        else:
-            move_right_counter = 0
-
-        # Down movement (tricky: only move once per delay interval)
-        if keys[pg.K_DOWN] or keys[pg.K_s]:
-            move_down_counter += 1
-            if move_down_counter == 1 or move_down_counter > move_delay:
-                current_piece.y += 1
-                if not current_piece.is_within_grid() or current_piece.collides_with_another_piece(locked_grid):
-                    current_piece.y -= 1
-        else:
-            move_down_counter = 0
+class Game:
+    '''
+    State of one game: grids, current and next piece, score, fall timer and key-repeat counters.
+    update() advances it by one fixed tick (1/TICK_RATE seconds of game time) and needs no window,
+    so it can run headless or faster than real time. `version` goes up whenever anything visible
+    changes, letting the loop skip redrawing identical frames.
+    '''
+    def __init__(self, fall_speed=30, move_delay=30, seed=None, pieces='uniform'):
+        self.rng = PieceGenerator(seed, pieces, SHAPES)
+        self.fall_speed = fall_speed  # How many ticks before the piece falls one cell
+        self.move_delay = move_delay  # Ticks between moves when holding a key
+        self.fall_time = 0
+        self.move_left_counter = 0
+        self.move_right_counter = 0
+        self.move_down_counter = 0
+        self.color_grid = [[None for _ in range(10)] for _ in range(20)]
+        self.locked_grid = [[False for _ in range(10)] for _ in range(20)]
+        self.score = 0
+        self.current_piece = self.new_piece()
+        self.next_piece = self.new_piece()
+        self.game_over = False
+        self.ticks = 0
+        self.version = 0
+
+    def new_piece(self):
+        return Piece(self.rng.draw())
+
+    def fits(self, piece):
+        return piece.is_within_grid() and not piece.collides_with_another_piece(self.locked_grid)
+
+    def lock(self):
+        '''
+        Locks the current piece into the grid and brings in the next one.
+        '''
+        piece = self.current_piece
+        for x, y in piece.get_blocks():
+            if 0 <= x < 10 and 0 <= y < 20:
+                self.color_grid[y][x] = piece.color
+                self.locked_grid[y][x] = True
+        self.current_piece = self.next_piece
+        self.next_piece = self.new_piece()
 
+    def fall(self):
+        '''
+        Handles the falling logic for the piece. Returns True if it locked.
+        '''
+        self.fall_time += 1
+        if self.fall_time >= self.fall_speed:
+            self.current_piece.y += 1  # Move piece down
+            self.fall_time = 0
+            # If piece is out of grid or collides, revert and lock
+            if not self.fits(self.current_piece):
+                self.current_piece.y -= 1
+                self.lock()
+                return True
+        return False
 
-        # Handle quit event and rotation
+    def held_move(self, counter, held, dx, dy):
+        '''
+        Moves the piece once when a key goes down and then every tick after move_delay ticks of holding it.
+        Returns the updated hold counter.
+        '''
+        if not held:
+            return 0
+        counter += 1
+        if counter == 1 or counter > self.move_delay:
+            piece = self.current_piece
+            piece.x += dx
+            piece.y += dy
+            if not self.fits(piece):
+                piece.x -= dx
+                piece.y -= dy
+        return counter
+
+    def line_check(self):
+        '''
+        Checks for full lines in locked_grid, removes them, and shifts above lines down in both locked_grid and color_grid.
+        '''
+        new_locked = []
+        new_color = []
+        for y in range(20):
+            if all(self.locked_grid[y]):
+                # Skip this row (remove it)
+                continue
+            new_locked.append(self.locked_grid[y][:])
+            new_color.append(self.color_grid[y][:])
+        # Count how many lines were removed
+        lines_removed = 20 - len(new_locked)
+        self.score += score_dict.get(lines_removed)  # Update score based on lines removed
+
+        # Add empty rows at the top
+        for _ in range(lines_removed):
+            new_locked.insert(0, [False]*10)
+            new_color.insert(0, [None]*10)
+        self.locked_grid = new_locked
+        self.color_grid = new_color
+
+    def update(self, left=False, right=False, down=False, rotate=False):
+        '''
+        Advances the game by one tick with the given keys held (rotate is a single press).
+        '''
+        if self.game_over:
+            return
+        self.ticks += 1
+        piece = self.current_piece
+        before = (piece.x, piece.y, piece.rotation)
+        locked = self.fall()
+        if check_game_over(self.current_piece, self.locked_grid):
+            self.game_over = True
+            self.version += 1
+            return
+        self.move_left_counter = self.held_move(self.move_left_counter, left, -1, 0)
+        self.move_right_counter = self.held_move(self.move_right_counter, right, 1, 0)
+        self.move_down_counter = self.held_move(self.move_down_counter, down, 0, 1)
+        if rotate:
+            self.current_piece.rotate(self.locked_grid)
+        if locked:
+            self.line_check()  # Lines can only fill when a piece locks
+        piece = self.current_piece
+        if locked or before != (piece.x, piece.y, piece.rotation):
+            self.version += 1
+
+class KeyboardControls:
+    '''
+    Reads the pygame event queue and held keys and turns them into Game.update() arguments.
+    '''
+    def __init__(self):
+        self.rotate = False
+        self.quit = False
+
+    def poll(self):
+        '''
+        Handles pending events; rotation presses are kept until the next tick picks them up.
+        '''
         for event in pg.event.get():
             if event.type == pg.QUIT:
-                running = False
+                self.quit = True
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_ESCAPE:
-                    running = False
+                    self.quit = True
                 elif event.key == pg.K_SPACE or event.key == pg.K_UP or event.key == pg.K_z:
-                    current_piece.rotate(locked_grid)
+                    self.rotate = True
+
+    def __call__(self, game):
+        keys = pg.key.get_pressed()
+        rotate, self.rotate = self.rotate, False
+        return (keys[pg.K_LEFT] or keys[pg.K_q], keys[pg.K_RIGHT] or keys[pg.K_d],
+                keys[pg.K_DOWN] or keys[pg.K_s], rotate)
 
-        line_check()
-        pg.display.flip()  # Update the display
-    pg.quit()  # Quit pygame when the game loop ends
\ No newline at end of file
+class HeuristicControls:
+    '''
+    Plays the game with a planner.HeuristicEvaluator: when a piece spawns it picks the best
+    placement for that piece (as planner.py does with depth=1), then each tick presses rotate until the
+    rotation matches, taps left/right towards the target column and soft-drops once it is there.
+    Taps only go out while the key's hold counter is 0, so every other tick moves the piece one cell.
+    '''
+    def __init__(self, evaluator):
+        from planner import BeamPlanner
+        self.planner = BeamPlanner(evaluator, depth=1)
+        self.piece = None
+        self.target = None
+
+    def plan(self, game):
+        action = self.planner.plan(game)
+        if action is None:
+            return None
+        rotation, left = divmod(action, 10)
+        shape = SHAPES[game.current_piece.shape_key]['shape'][rotation]
+        return rotation, left - min(x for x, y in shape)
+
+    def __call__(self, game):
+        piece = game.current_piece
+        if piece is not self.piece:
+            self.piece = piece
+            self.target = self.plan(game)
+        if self.target is None:
+            return ()
+        rotation, x = self.target
+        if piece.rotation != rotation:
+            return False, False, False, True
+        return (piece.x > x and game.move_left_counter == 0, piece.x < x and game.move_right_counter == 0,
+                piece.x == x and game.move_down_counter == 0, False)
+
+def run(game, graphics=None, policy=None, speed=1.0, max_fps=60, max_ticks=None):
+    '''
+    Fixed-timestep game loop. The simulation advances `speed` times faster than real time
+    (speed=None: as fast as possible), independently of drawing, which happens at most
+    `max_fps` times per second and only when the game changed since the last frame.
+    policy(game) returns the update() arguments for a tick; it defaults to the keyboard, or to
+    no input when running headless (without graphics). Returns the game.
+    '''
+    controls = KeyboardControls() if graphics is not None else None
+    policy = policy or controls or (lambda game: ())
+    clock = pg.time.Clock()
+    frame_time = 1.0 / max_fps
+    drawn = None
+    lag = 0.0
+    last = time.perf_counter()
+    while not game.game_over and (max_ticks is None or game.ticks < max_ticks):
+        if controls is not None:
+            controls.poll()
+            if controls.quit:
+                return game
+        now = time.perf_counter()
+        if speed is None:
+            due = float('inf')
+            deadline = now + frame_time if graphics is not None else float('inf')
+        else:
+            lag += (now - last) * speed * TICK_RATE
+            due = min(int(lag), int(speed * TICK_RATE) + 1)  # Drop the backlog rather than spiral after a stall
+            lag -= int(lag)
+            deadline = float('inf')
+        last = now
+        ticked = 0
+        while ticked < due and not game.game_over and (max_ticks is None or game.ticks < max_ticks):
+            game.update(*policy(game))
+            ticked += 1
+            if ticked % 64 == 0 and time.perf_counter() >= deadline:
+                break
+        if graphics is not None:
+            if game.version != drawn:
+                graphics.render(game.current_piece, game.color_grid, game.next_piece, game.score)
+                drawn = game.version
+            clock.tick(max_fps)  # Sleeps off the rest of the frame
+        elif speed is not None:
+            time.sleep((1 - lag) / (speed * TICK_RATE))
+    if game.game_over and graphics is not None:
+        graphics.render(game.current_piece, game.color_grid, game.next_piece, game.score)
+        graphics.draw_game_over_overlay()
+        pg.display.flip()
+        while pg.event.wait().type not in (pg.QUIT, pg.KEYDOWN):
+            pass
+    return game
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Tetris, or run it headless at a fixed timestep.")
+    parser.add_argument('--speed', type=float, default=1.0, help="Game speed as a multiple of real time (0: as fast as possible)")
+    parser.add_argument('--fps', type=int, default=60, help="Maximum redraws per second")
+    parser.add_argument('--headless', action='store_true', help="Run without a window")
+    parser.add_argument('--ticks', type=int, default=None, help="Stop after this many simulation ticks")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--pieces', choices=PieceGenerator.MODES, default='uniform', help="Piece sequence: independent draws or 7-bag")
+    parser.add_argument('--weights', default=None, help="Let a heuristic with this weight file (e.g. from cem.py) play")
+    parser.add_argument('--mute', action='store_true')
+    args = parser.parse_args(argv)
+
+    game = Game(seed=args.seed, pieces=args.pieces)
+    policy = None
+    if args.weights:
+        from planner import HeuristicEvaluator
+        policy = HeuristicControls(HeuristicEvaluator.load(args.weights))
+    speed = args.speed or None
+    if args.headless:
+        start = time.perf_counter()
+        run(game, policy=policy, speed=speed, max_ticks=args.ticks)
+        elapsed = time.perf_counter() - start
+        print(f"{game.ticks} ticks in {elapsed:.2f}s ({game.ticks / elapsed:.0f} ticks/s), score {game.score}, "
+              f"{'game over' if game.game_over else 'stopped'}")
+        return
+    pg.init()  # Initialize pygame
+    graphics = Graphics(dirty_rects=True)  # Create graphics handler
+    if not args.mute:
+        pg.mixer.init()
+        pg.mixer.music.load("background_music.mp3")
+        pg.mixer.music.play(-1)
+    run(game, graphics, policy, speed=speed, max_fps=args.fps, max_ticks=args.ticks)
+    pg.quit()  # Quit pygame when the game loop ends
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,52 @@
 import numpy as np
 import random
+import time
+from metrics import metrics
+from features import column_stats, row_transitions, combine
+from pieces import PieceGenerator
 
 class TetrisEnv:
-    def __init__(self):
-        self.grid_width = 10
-        self.grid_height = 20
-        self.SHAPES = {
-            'I': {'shape': [[(0,1), (1,1), (2,1), (3,1)], [(2,0), (2,1), (2,2), (2,3)]], 'color': (0, 255, 255)},
-            'O': {'shape': [[(1,0), (2,0), (1,1), (2,1)]], 'color': (255, 255, 0)},
-            'T': {'shape': [[(1,0), (0,1), (1,1), (2,1)], [(1,0), (1,1), (2,1), (1,2)], [(0,1), (1,1), (2,1), (1,2)], [(1,0), (0,1), (1,1), (1,2)]], 'color': (128, 0, 128)},
-            'S': {'shape': [[(1,0), (2,0), (0,1), (1,1)], [(1,0), (1,1), (2,1), (2,2)]], 'color': (0, 255, 0)},
-            'Z': {'shape': [[(0,0), (1,0), (1,1), (2,1)], [(2,0), (1,1), (2,1), (1,2)]], 'color': (255, 0, 0)},
-            'J': {'shape': [[(0,0), (0,1), (1,1), (2,1)], [(1,0), (2,0), (1,1), (1,2)], [(0,1), (1,1), (2,1), (2,2)], [(1,0), (1,1), (0,2), (1,2)]], 'color': (0, 0, 255)},
-            'L': {'shape': [[(2,0), (0,1), (1,1), (2,1)], [(1,0), (1,1), (1,2), (2,2)], [(0,1), (1,1), (2,1), (0,2)], [(0,0), (1,0), (1,1), (1,2)]], 'color': (255, 165, 0)}
-        }
-        self.action_space = 5  # 0: None, 1: Left, 2: Right, 3: Rotate, 4: Down
-        self.reward_dict = {
+    SHAPES = {
+        'I': {'shape': [[(0,1), (1,1), (2,1), (3,1)], [(2,0), (2,1), (2,2), (2,3)]], 'color': (0, 255, 255)},
+        'O': {'shape': [[(1,0), (2,0), (1,1), (2,1)]], 'color': (255, 255, 0)},
+        'T': {'shape': [[(1,0), (0,1), (1,1), (2,1)], [(1,0), (1,1), (2,1), (1,2)], [(0,1), (1,1), (2,1), (1,2)], [(1,0), (0,1), (1,1), (1,2)]], 'color': (128, 0, 128)},
+        'S': {'shape': [[(1,0), (2,0), (0,1), (1,1)], [(1,0), (1,1), (2,1), (2,2)]], 'color': (0, 255, 0)},
+        'Z': {'shape': [[(0,0), (1,0), (1,1), (2,1)], [(2,0), (1,1), (2,1), (1,2)]], 'color': (255, 0, 0)},
+        'J': {'shape': [[(0,0), (0,1), (1,1), (2,1)], [(1,0), (2,0), (1,1), (1,2)], [(0,1), (1,1), (2,1), (2,2)], [(1,0), (1,1), (0,2), (1,2)]], 'color': (0, 0, 255)},
+        'L': {'shape': [[(2,0), (0,1), (1,1), (2,1)], [(1,0), (1,1), (1,2), (2,2)], [(0,1), (1,1), (2,1), (0,2)], [(0,0), (1,0), (1,1), (1,2)]], 'color': (255, 165, 0)}
+    }
+    reward_dict = {
         0: 0,
         1: 40,
-        2: 100, 
-        3: 300, 
+        2: 100,
+        3: 300,
         4: 1200
-        }  
+    }
+
+    LANDING = None  # Per-shape placement tables, built on first use by build_landing_tables()
+
+    def __init__(self, action_mode='primitive', obs_layout=None, seed=None, pieces='uniform'):
+        self.grid_width = 10
+        self.grid_height = 20
+        self.action_mode = action_mode
+        # Observation layout: None returns a fresh (2, 20, 10) float32 array per call; 'planes', 'flat'
+        # and 'uint8' return the persistent buffer itself as (2, 20, 10) float32, (400,) float32 or (2, 20, 10) uint8
+        if obs_layout not in (None, 'planes', 'flat', 'uint8'):
+            raise ValueError(f"Unknown obs_layout: {obs_layout}")
+        self.obs_layout = obs_layout
+        # Piece sequence: a PieceGenerator or its mode name. Without a seed it is seeded from the global
+        # random module, so random.seed() before construction still fixes the pieces
+        if isinstance(pieces, str):
+            pieces = PieceGenerator(random.getrandbits(64) if seed is None else seed, pieces, self.SHAPES)
+        self.rng = pieces
+        self.obs_buffer = np.zeros((2, self.grid_height, self.grid_width), dtype=np.uint8 if obs_layout == 'uint8' else np.float32)
+        self.drawn_blocks = []
+        if action_mode == 'primitive':
+            self.action_space = 5  # 0: None, 1: Left, 2: Right, 3: Rotate, 4: Down
+        elif action_mode == 'placement':
+            self.action_space = 4 * self.grid_width  # rotation * grid_width + leftmost column, then hard drop
+        else:
+            raise ValueError(f"Unknown action_mode: {action_mode}")
         self.reset()
 
     class Piece:
@@ -61,14 +86,18 @@ class TetrisEnv:
         self.locked_grid = [[False for _ in range(self.grid_width)] for _ in range(self.grid_height)]
         self.score = 0
         self.lines_cleared = 0
-        self.current_piece = self.Piece(random.choice(list(self.SHAPES.keys())), self.SHAPES)
-        self.next_piece = self.Piece(random.choice(list(self.SHAPES.keys())), self.SHAPES)
+        self.current_piece = self.Piece(self.rng.draw(), self.SHAPES)
+        self.next_piece = self.Piece(self.rng.draw(), self.SHAPES)
         self.done = False
+        self.rebuild_obs()
+        self.rebuild_features()
         return self.get_state()
 
     def step(self, action):
         if self.done:
             return self.get_state(), 0, True
+        if self.action_mode == 'placement':
+            return self.step_placement(action)
 
         # Actions: 0: No-op, 1: Left, 2: Right, 3: Rotate, 4: Down, 
         if action == 1:
@@ -90,38 +119,264 @@ class TetrisEnv:
         self.current_piece.y += 1
         if not self.current_piece.is_within_grid(self.grid_width, self.grid_height) or self.current_piece.collides_with_another_piece(self.locked_grid):
             self.current_piece.y -= 1
-            # Lock the piece
-            for x, y in self.current_piece.get_blocks():
-                if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
-                    self.locked_grid[y][x] = True
-            # Check for line clears
-            lines_cleared = 0
-            new_locked = []
-            for y in range(self.grid_height):
-                if all(self.locked_grid[y]):
-                    lines_cleared += 1
-                else:
-                    new_locked.append(self.locked_grid[y][:])
-            for _ in range(lines_cleared):
-                new_locked.insert(0, [False]*self.grid_width)
-            self.locked_grid = new_locked
-            self.lines_cleared += lines_cleared
-            reward = self.reward_dict.get(lines_cleared, 0)
-            # Spawn next piece
-            self.current_piece = self.next_piece
-            self.next_piece = self.Piece(random.choice(list(self.SHAPES.keys())), self.SHAPES)
-            # Check for game over
-            if self.current_piece.collides_with_another_piece(self.locked_grid):
-                self.done = True
-                return self.get_state(), reward, True
-            return self.get_state(), reward, False
+            return self.lock_piece()
         return self.get_state(), 0, False
 
-    def get_state(self):
-        # State: grid + current piece position/shape/rotation (simple version)
-        grid = np.array(self.locked_grid, dtype=np.float32)
-        piece_grid = np.zeros_like(grid)
+    def lock_piece(self):
+        '''
+        Locks the current piece where it stands, clears full lines and spawns the next piece.
+        Returns (state, reward, done) like step().
+        '''
+        # Lock the piece
         for x, y in self.current_piece.get_blocks():
-            piece_grid[y][x] = 1.0
-        state = np.stack([grid, piece_grid], axis=0)  # Shape: (2, 20, 10)
+            if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+                self.locked_grid[y][x] = True
+        # Check for line clears
+        lines_cleared = 0
+        new_locked = []
+        for y in range(self.grid_height):
+            if all(self.locked_grid[y]):
+                lines_cleared += 1
+            else:
+                new_locked.append(self.locked_grid[y][:])
+        for _ in range(lines_cleared):
+            new_locked.insert(0, [False]*self.grid_width)
+        self.locked_grid = new_locked
+        self.lines_cleared += lines_cleared
+        if metrics.enabled:
+            metrics.count('locks')
+            if lines_cleared:
+                metrics.count(f'lines_{lines_cleared}')
+        # Update the board plane: the 4 locked cells, or the whole plane when rows shifted
+        if lines_cleared:
+            self.obs_buffer[0] = self.locked_grid
+            self.rebuild_features()
+        else:
+            for x, y in self.current_piece.get_blocks():
+                if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+                    self.obs_buffer[0, y, x] = 1
+            self.update_features(self.current_piece.get_blocks())
+        reward = self.reward_dict.get(lines_cleared, 0)
+        # Spawn next piece
+        self.current_piece = self.next_piece
+        self.next_piece = self.Piece(self.rng.draw(), self.SHAPES)
+        # Check for game over
+        if self.current_piece.collides_with_another_piece(self.locked_grid):
+            self.done = True
+            return self.get_state(), reward, True
+        return self.get_state(), reward, False
+
+    @classmethod
+    def build_landing_tables(cls, grid_width=10):
+        '''
+        Precomputes, for every shape, one row per (rotation, leftmost column) placement:
+        placement action id, rotation, piece x, the 4 board columns the piece covers with the
+        highest and lowest block offset in each of them (padded by repetition), and block offsets.
+        '''
+        cls.LANDING = {}
+        for key, data in cls.SHAPES.items():
+            actions, rotations, origins, columns, tops, bottoms, blocks = [], [], [], [], [], [], []
+            for rotation, shape in enumerate(data['shape']):
+                min_x = min(bx for bx, by in shape)
+                max_x = max(bx for bx, by in shape)
+                highest, lowest = {}, {}
+                for bx, by in shape:
+                    highest[bx] = min(highest.get(bx, by), by)
+                    lowest[bx] = max(lowest.get(bx, by), by)
+                piece_columns = sorted(lowest)
+                piece_columns += [piece_columns[0]] * (4 - len(piece_columns))
+                for left in range(grid_width - (max_x - min_x)):
+                    x = left - min_x
+                    actions.append(rotation * grid_width + left)
+                    rotations.append(rotation)
+                    origins.append(x)
+                    columns.append([x + c for c in piece_columns])
+                    tops.append([highest[c] for c in piece_columns])
+                    bottoms.append([lowest[c] for c in piece_columns])
+                    blocks.append(shape)
+            cls.LANDING[key] = {
+                'actions': np.array(actions), 'rotations': np.array(rotations), 'x': np.array(origins),
+                'columns': np.array(columns), 'tops': np.array(tops), 'bottoms': np.array(bottoms), 'blocks': np.array(blocks)
+            }
+        return cls.LANDING
+
+    @classmethod
+    def landing(cls, grid, shape_key):
+        '''
+        Returns the landing table of the shape and the hard-drop y of each of its placements on a
+        (20, 10) bool grid (negative when the piece does not fit at the top of the board).
+        '''
+        if TetrisEnv.LANDING is None:
+            TetrisEnv.build_landing_tables(grid.shape[1])
+        table = cls.LANDING[shape_key]
+        height = grid.shape[0]
+        # below[r, c]: first locked row at or under row r in column c (height if none)
+        rows = np.where(grid, np.arange(height)[:, None], height)
+        below = np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+        y = (below[table['tops'], table['columns']] - 1 - table['bottoms']).min(axis=1)
+        return table, y
+
+    @classmethod
+    def placements(cls, grid, shape_key):
+        '''
+        Enumerates every legal final placement (rotation, column, hard drop) of a shape on a (20, 10)
+        bool grid. Returns (actions, boards, lines): placement action ids, the resulting bool grids
+        after line clears as a (K, 20, 10) array, and the number of lines each one clears.
+        '''
+        table, y = cls.landing(grid, shape_key)
+        legal = y >= 0
+        k = int(legal.sum())
+        boards = np.repeat(grid[None], k, axis=0)
+        xs = table['blocks'][legal][..., 0] + table['x'][legal][:, None]
+        ys = table['blocks'][legal][..., 1] + y[legal][:, None]
+        boards[np.arange(k)[:, None], ys, xs] = True
+        full = boards.all(axis=2)
+        lines = full.sum(axis=1)
+        cleared = np.flatnonzero(lines)
+        if len(cleared):
+            # Stable-sort full rows to the top, then blank them
+            order = np.argsort(~full[cleared], axis=1, kind='stable')
+            compacted = np.take_along_axis(boards[cleared], order[:, :, None], axis=1)
+            compacted[np.arange(grid.shape[0])[None, :] < lines[cleared][:, None]] = False
+            boards[cleared] = compacted
+        return table['actions'][legal], boards, lines
+
+    def get_placements(self):
+        '''
+        Enumerates every legal final placement of the current piece; see placements().
+        Boards are returned as a (K, 20, 10) float32 array.
+        '''
+        actions, boards, lines = self.placements(np.array(self.locked_grid, dtype=bool), self.current_piece.shape_key)
+        return actions, boards.astype(np.float32), lines
+
+    def step_placement(self, action):
+        '''
+        Moves the current piece to placement `action` (rotation * grid_width + leftmost column),
+        hard drops and locks it. Returns (state, reward, done) like step().
+        '''
+        if self.done:
+            return self.get_state(), 0, True
+        table, y = self.landing(np.array(self.locked_grid, dtype=bool), self.current_piece.shape_key)
+        match = np.flatnonzero(table['actions'] == action)
+        if len(match) == 0 or y[match[0]] < 0:
+            raise ValueError(f"Illegal placement {action} for piece {self.current_piece.shape_key}")
+        i = match[0]
+        self.current_piece.rotation = int(table['rotations'][i])
+        self.current_piece.x = int(table['x'][i])
+        self.current_piece.y = int(y[i])
+        return self.lock_piece()
+
+    def rebuild_obs(self):
+        '''
+        Redraws the observation buffer from scratch; needed after the board is replaced wholesale.
+        '''
+        self.obs_buffer[0] = self.locked_grid
+        self.obs_buffer[1] = 0
+        self.drawn_blocks = []
+
+    def get_snapshot(self, rng=True):
+        '''
+        Captures the game in an immutable, hashable tuple: (bit-packed board bytes, current piece key,
+        rotation, x, y, next piece key, score, lines cleared, done, piece RNG state). With rng=False
+        the RNG state is None, so equal positions give equal snapshots (e.g. as transposition-table keys).
+        '''
+        piece = self.current_piece
+        return (np.packbits(self.obs_buffer[0] != 0).tobytes(), piece.shape_key, piece.rotation, piece.x, piece.y,
+                self.next_piece.shape_key, self.score, self.lines_cleared, self.done,
+                self.rng.getstate() if rng else None)
+
+    def restore(self, snapshot):
+        '''
+        Puts the env back in the state captured by get_snapshot(). The piece RNG is only rewound
+        when the snapshot holds its state.
+        '''
+        board, key, rotation, x, y, next_key, self.score, self.lines_cleared, self.done, rng_state = snapshot
+        grid = np.unpackbits(np.frombuffer(board, dtype=np.uint8), count=self.grid_height * self.grid_width)
+        grid = grid.reshape(self.grid_height, self.grid_width)
+        self.set_board(grid)
+        piece = self.current_piece = self.Piece(key, self.SHAPES)
+        piece.rotation, piece.x, piece.y = rotation, x, y
+        self.next_piece = self.Piece(next_key, self.SHAPES)
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+        self.obs_buffer[0] = grid
+        self.obs_buffer[1] = 0
+        self.drawn_blocks = []
+        self.rebuild_features()
+
+    def set_board(self, grid):
+        '''
+        Replaces the locked cells with a (20, 10) 0/1 array, leaving observations and features to the caller.
+        '''
+        self.locked_grid = grid.astype(bool).tolist()
+
+    def rebuild_features(self):
+        '''
+        Marks every per-column and per-row board statistic for recomputation (after a line clear or reset).
+        '''
+        self.features_stale = True
+        self.dirty_columns = set()
+        self.dirty_rows = set()
+
+    def update_features(self, blocks):
+        '''
+        Marks the columns and rows touched by newly locked blocks; they are recomputed on the next get_features().
+        '''
+        for x, y in blocks:
+            self.dirty_columns.add(x)
+            self.dirty_rows.add(y)
+
+    def get_features(self):
+        '''
+        Board feature vector (see features.FEATURE_NAMES): column heights, holes and well depths,
+        then aggregate height, max height, holes, bumpiness, row and column transitions.
+        Only columns and rows changed by locks since the last call are recomputed.
+        '''
+        board = self.obs_buffer[0] != 0
+        if self.features_stale:
+            self.column_heights, self.column_holes, self.column_transitions = column_stats(board)
+            self.row_transitions = row_transitions(board)
+            self.features_stale = False
+        elif self.dirty_columns:
+            columns = sorted(x for x in self.dirty_columns if 0 <= x < self.grid_width)
+            rows = sorted(y for y in self.dirty_rows if 0 <= y < self.grid_height)
+            heights, holes, transitions = column_stats(board[:, columns])
+            self.column_heights[columns] = heights
+            self.column_holes[columns] = holes
+            self.column_transitions[columns] = transitions
+            self.row_transitions[rows] = row_transitions(board[rows])
+        self.dirty_columns.clear()
+        self.dirty_rows.clear()
+        return combine(self.column_heights, self.column_holes, self.column_transitions,
+                       self.row_transitions.sum(), self.grid_height)
+
+    def get_state(self, out=None):
+        '''
+        State: grid + current piece (2, 20, 10). Only the piece cells that moved are redrawn in the
+        persistent buffer; the board plane is kept up to date by lock_piece(). If `out` is given
+        (e.g. a row of a batch array or a replay slot, any shape holding 400 values and any dtype),
+        the state is written into it and `out` is returned.
+        '''
+        timed = metrics.enabled
+        if timed:
+            start = time.perf_counter()
+        blocks = self.current_piece.get_blocks()
+        if blocks != self.drawn_blocks:
+            piece_plane = self.obs_buffer[1]
+            for x, y in self.drawn_blocks:
+                piece_plane[y, x] = 0
+            for x, y in blocks:
+                piece_plane[y, x] = 1
+            self.drawn_blocks = blocks
+        if out is not None:
+            np.copyto(out, self.obs_buffer.reshape(out.shape), casting='unsafe')
+            state = out
+        elif self.obs_layout is None:
+            state = self.obs_buffer.copy()
+        elif self.obs_layout == 'flat':
+            state = self.obs_buffer.reshape(-1)
+        else:
+            state = self.obs_buffer
+        if timed:
+            metrics.record('get_state', time.perf_counter() - start)
         return state
\ No newline at end of file
@@ -0,0 +1,225 @@
+import numpy as np
+import json
+import os
+from tetris_env import TetrisEnv
+
+PIECE_IDS = {key: i for i, key in enumerate(TetrisEnv.SHAPES)}
+
+# Per-row fields besides the packed states. Row r holds the observation at one time step and the
+# action taken from it; the last row of an episode is its final observation and has valid = 0.
+FIELDS = {
+    'actions': np.int16,
+    'rewards': np.float32,
+    'dones': np.uint8,
+    'pieces': np.int8,
+    'valid': np.uint8,
+}
+
+def _chunk_path(directory, chunk, field):
+    return os.path.join(directory, f"chunk_{chunk:05d}_{field}.bin")
+
+def _open_chunk(directory, chunk, chunk_size, packed_size, mode):
+    '''
+    Opens the memory-mapped files of one chunk and returns {field: array}.
+    '''
+    arrays = {'states': np.memmap(_chunk_path(directory, chunk, 'states'), dtype=np.uint8, mode=mode, shape=(chunk_size, packed_size))}
+    for field, dtype in FIELDS.items():
+        arrays[field] = np.memmap(_chunk_path(directory, chunk, field), dtype=dtype, mode=mode, shape=(chunk_size,))
+    return arrays
+
+class TrajectoryRecorder:
+    '''
+    Appends every episode to chunked, memory-mapped binary files in `directory`:
+    bit-packed boards, actions, rewards, dones and piece ids, plus episodes.bin, an index of
+    (first row, number of transitions) per episode, and meta.json describing the layout.
+    Call reset() with the first observation of an episode, then step() after every env step.
+    '''
+    def __init__(self, directory, chunk_size=1000000, state_shape=(2, 20, 10)):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            size = int(np.prod(state_shape))
+            self.meta = {'chunk_size': chunk_size, 'state_shape': list(state_shape), 'state_size': size,
+                         'packed_size': (size + 7) // 8, 'rows': 0, 'episodes': 0}
+        self.chunk_size = self.meta['chunk_size']
+        self.packed_size = self.meta['packed_size']
+        self.rows = self.meta['rows']
+        self.chunk = None
+        self.arrays = None
+        self.episode_start = None
+
+    def _row(self, row):
+        chunk, offset = divmod(row, self.chunk_size)
+        if chunk != self.chunk:
+            self._flush()
+            mode = 'r+' if os.path.exists(_chunk_path(self.directory, chunk, 'states')) else 'w+'
+            self.arrays = _open_chunk(self.directory, chunk, self.chunk_size, self.packed_size, mode)
+            self.chunk = chunk
+        return offset
+
+    def _write(self, state, piece):
+        offset = self._row(self.rows)
+        self.arrays['states'][offset] = np.packbits(np.asarray(state).reshape(-1) != 0)
+        self.arrays['pieces'][offset] = PIECE_IDS[piece] if isinstance(piece, str) else piece
+        self.arrays['valid'][offset] = 0
+        self.rows += 1
+        return offset
+
+    def reset(self, state, piece):
+        '''
+        Starts a new episode from its first observation and the current piece (shape key or id).
+        '''
+        if self.episode_start is not None:
+            self.end_episode()
+        self.episode_start = self.rows
+        self._write(state, piece)
+
+    def step(self, action, reward, next_state, done, piece):
+        '''
+        Records the action taken from the last observation and the resulting observation.
+        '''
+        offset = self._row(self.rows - 1)
+        self.arrays['actions'][offset] = action
+        self.arrays['rewards'][offset] = reward
+        self.arrays['dones'][offset] = done
+        self.arrays['valid'][offset] = 1
+        self._write(next_state, piece)
+        if done:
+            self.end_episode()
+
+    def end_episode(self):
+        '''
+        Appends the current episode to the index and publishes the new row count.
+        '''
+        length = self.rows - self.episode_start - 1
+        with open(os.path.join(self.directory, 'episodes.bin'), 'ab') as f:
+            f.write(np.array([self.episode_start, length], dtype=np.int64).tobytes())
+        self.episode_start = None
+        self.meta['episodes'] += 1
+        self._flush()
+
+    def _flush(self):
+        if self.arrays is not None:
+            for array in self.arrays.values():
+                array.flush()
+        self.meta['rows'] = self.rows if self.episode_start is None else self.episode_start
+        tmp_path = os.path.join(self.directory, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.directory, 'meta.json'))
+
+    def close(self):
+        '''
+        Flushes the files; an unfinished episode is dropped and its rows are reused by the next recorder.
+        '''
+        if self.episode_start is not None:
+            self.rows = self.episode_start
+            self.episode_start = None
+        self._flush()
+        self.arrays = None
+
+class TrajectoryDataset:
+    '''
+    Reads a directory written by TrajectoryRecorder. Chunks are opened read-only as memory maps,
+    so raw arrays are views of the files; only sampled rows are unpacked into float32 batches.
+    '''
+    def __init__(self, directory, seed=None):
+        self.directory = directory
+        self.rng = np.random.default_rng(seed)
+        self.chunks = {}
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Picks up episodes written since the dataset was opened.
+        '''
+        with open(os.path.join(self.directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.chunk_size = self.meta['chunk_size']
+        self.state_size = self.meta['state_size']
+        self.rows = self.meta['rows']
+        index_path = os.path.join(self.directory, 'episodes.bin')
+        if os.path.exists(index_path) and os.path.getsize(index_path):
+            self.index = np.fromfile(index_path, dtype=np.int64).reshape(-1, 2)
+        else:
+            self.index = np.zeros((0, 2), dtype=np.int64)
+        self.index = self.index[self.index[:, 0] < self.rows]
+        self.num_transitions = int(self.index[:, 1].sum())
+
+    def __len__(self):
+        return self.num_transitions
+
+    def _chunk(self, chunk):
+        if chunk not in self.chunks:
+            self.chunks[chunk] = _open_chunk(self.directory, chunk, self.chunk_size, self.meta['packed_size'], 'r')
+        return self.chunks[chunk]
+
+    def read(self, field, rows):
+        '''
+        Gathers `field` at the given global rows, chunk by chunk.
+        '''
+        rows = np.asarray(rows)
+        chunks, offsets = np.divmod(rows, self.chunk_size)
+        first = self._chunk(int(chunks[0]))[field]
+        out = np.empty((len(rows),) + first.shape[1:], dtype=first.dtype)
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            out[mask] = self._chunk(int(chunk))[field][offsets[mask]]
+        return out
+
+    def unpack(self, packed):
+        return np.unpackbits(packed, axis=1, count=self.state_size).astype(np.float32)
+
+    def sample_rows(self, batch_size):
+        '''
+        Draws `batch_size` transition rows uniformly, rejecting episode-final observation rows.
+        '''
+        rows = self.rng.integers(0, self.rows, batch_size)
+        bad = self.read('valid', rows) == 0
+        while bad.any():
+            rows[bad] = self.rng.integers(0, self.rows, int(bad.sum()))
+            bad = self.read('valid', rows) == 0
+        return np.sort(rows)
+
+    def get(self, rows):
+        '''
+        Returns (states, actions, rewards, next_states, dones) for the given rows, states flat float32.
+        '''
+        return (self.unpack(self.read('states', rows)), self.read('actions', rows).astype(np.int32),
+                self.read('rewards', rows), self.unpack(self.read('states', rows + 1)),
+                self.read('dones', rows).astype(np.float32))
+
+    def batches(self, batch_size, num_batches=None):
+        '''
+        Yields random minibatches; runs forever when num_batches is None.
+        '''
+        produced = 0
+        while num_batches is None or produced < num_batches:
+            yield self.get(self.sample_rows(batch_size))
+            produced += 1
+
+    def episode(self, i):
+        '''
+        Returns the raw arrays of episode i: packed states (length + 1 rows) and per-step fields.
+        '''
+        start, length = self.index[i]
+        rows = np.arange(start, start + length + 1)
+        episode = {'states': self.read('states', rows)}
+        for field in FIELDS:
+            episode[field] = self.read(field, rows[:-1])
+        return episode
+
+    def as_tf_dataset(self, batch_size, prefetch=2):
+        '''
+        Wraps batches() in a tf.data.Dataset of (states, actions, rewards, next_states, dones).
+        '''
+        import tensorflow as tf
+        signature = (tf.TensorSpec((batch_size, self.state_size), tf.float32), tf.TensorSpec((batch_size,), tf.int32),
+                     tf.TensorSpec((batch_size,), tf.float32), tf.TensorSpec((batch_size, self.state_size), tf.float32),
+                     tf.TensorSpec((batch_size,), tf.float32))
+        dataset = tf.data.Dataset.from_generator(lambda: self.batches(batch_size), output_signature=signature)
+        return dataset.prefetch(prefetch)
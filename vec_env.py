@@ -0,0 +1,130 @@
+import numpy as np
+from tetris_env import TetrisEnv
+
+class TetrisVecEnv:
+    '''
+    N independent Tetris games stepped together with vectorized NumPy ops.
+    Boards, current/next pieces, scores and done flags live in contiguous arrays; one call to
+    step(actions) applies the move, gravity, locking, line clears and auto-reset for every game,
+    using the same rules and reward_dict as TetrisEnv.step.
+    '''
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.grid_width = 10
+        self.grid_height = 20
+        self.action_space = 5  # 0: None, 1: Left, 2: Right, 3: Rotate, 4: Down
+        self.shape_keys = list(TetrisEnv.SHAPES.keys())
+        self.rng = np.random.default_rng(seed)
+        # blocks[kind, rotation] -> (4, 2) block offsets; rotations past a shape's count wrap around
+        self.num_rotations = np.array([len(TetrisEnv.SHAPES[k]['shape']) for k in self.shape_keys])
+        self.blocks = np.array([[TetrisEnv.SHAPES[k]['shape'][r % len(TetrisEnv.SHAPES[k]['shape'])] for r in range(4)] for k in self.shape_keys])
+        self.reward_table = np.array([TetrisEnv.reward_dict.get(i, 0) for i in range(self.grid_height + 1)], dtype=np.float32)
+
+        self.boards = np.zeros((n, self.grid_height, self.grid_width), dtype=bool)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.next_kind = np.zeros(n, dtype=np.int64)
+        self.scores = np.zeros(n, dtype=np.int64)
+        self.lines_cleared = np.zeros(n, dtype=np.int64)
+        self.dones = np.zeros(n, dtype=bool)
+        self.final_scores = np.zeros(n, dtype=np.int64)  # Score of the last finished episode per env
+        self.reset()
+
+    def _reset_envs(self, idx):
+        '''
+        Resets the games at the given indices to an empty board with fresh pieces.
+        '''
+        self.boards[idx] = False
+        self.scores[idx] = 0
+        self.lines_cleared[idx] = 0
+        self.kind[idx] = self.rng.integers(0, len(self.shape_keys), len(idx))
+        self.next_kind[idx] = self.rng.integers(0, len(self.shape_keys), len(idx))
+        self.rotation[idx] = 0
+        self.x[idx] = 3
+        self.y[idx] = 0
+        self.dones[idx] = False
+
+    def reset(self):
+        self._reset_envs(np.arange(self.n))
+        return self.get_state()
+
+    def _cells(self, kind, rotation, x, y):
+        blocks = self.blocks[kind, rotation]  # (k, 4, 2)
+        return blocks[..., 0] + x[:, None], blocks[..., 1] + y[:, None]
+
+    def _fits(self, idx, kind, rotation, x, y):
+        '''
+        Returns a bool array: True where the piece is inside the grid and does not overlap locked cells.
+        '''
+        xs, ys = self._cells(kind, rotation, x, y)
+        inside = ((xs >= 0) & (xs < self.grid_width) & (ys >= 0) & (ys < self.grid_height)).all(axis=1)
+        hit = self.boards[idx[:, None], np.clip(ys, 0, self.grid_height - 1), np.clip(xs, 0, self.grid_width - 1)].any(axis=1)
+        return inside & ~hit
+
+    def step(self, actions):
+        '''
+        Applies one action per game. Returns (states, rewards, dones); games that ended are
+        reset automatically, so their returned state is the first state of the new episode.
+        '''
+        actions = np.asarray(actions)
+        self.dones[:] = False
+        idx = np.arange(self.n)
+        kind = self.kind
+
+        # Actions: 0: No-op, 1: Left, 2: Right, 3: Rotate, 4: Down
+        new_x = self.x - (actions == 1) + (actions == 2)
+        new_y = self.y + (actions == 4)
+        new_rotation = np.where(actions == 3, (self.rotation + 1) % self.num_rotations[kind], self.rotation)
+        ok = self._fits(idx, kind, new_rotation, new_x, new_y)
+        self.x = np.where(ok, new_x, self.x)
+        self.y = np.where(ok, new_y, self.y)
+        self.rotation = np.where(ok, new_rotation, self.rotation)
+
+        # Move piece down by one (gravity)
+        falls = self._fits(idx, kind, self.rotation, self.x, self.y + 1)
+        self.y += falls
+
+        rewards = np.zeros(self.n, dtype=np.float32)
+        lock = np.flatnonzero(~falls)
+        if len(lock):
+            # Lock the pieces
+            xs, ys = self._cells(kind[lock], self.rotation[lock], self.x[lock], self.y[lock])
+            self.boards[lock[:, None], ys, xs] = True
+            # Check for line clears: stable-sort full rows to the top and blank them
+            boards = self.boards[lock]
+            full = boards.all(axis=2)
+            lines = full.sum(axis=1)
+            cleared = np.flatnonzero(lines)
+            if len(cleared):
+                order = np.argsort(~full[cleared], axis=1, kind='stable')
+                compacted = np.take_along_axis(boards[cleared], order[:, :, None], axis=1)
+                compacted[np.arange(self.grid_height)[None, :] < lines[cleared][:, None]] = False
+                self.boards[lock[cleared]] = compacted
+            rewards[lock] = self.reward_table[lines]
+            self.scores[lock] += self.reward_table[lines].astype(np.int64)
+            self.lines_cleared[lock] += lines
+            # Spawn next piece
+            self.kind[lock] = self.next_kind[lock]
+            self.next_kind[lock] = self.rng.integers(0, len(self.shape_keys), len(lock))
+            self.rotation[lock] = 0
+            self.x[lock] = 3
+            self.y[lock] = 0
+            # Check for game over
+            over = lock[~self._fits(lock, self.kind[lock], self.rotation[lock], self.x[lock], self.y[lock])]
+            if len(over):
+                self.final_scores[over] = self.scores[over]
+                self._reset_envs(over)
+                self.dones[over] = True
+        return self.get_state(), rewards, self.dones.copy()
+
+    def get_state(self):
+        '''
+        Returns the stacked observations, shape (N, 2, 20, 10): locked grid and current piece.
+        '''
+        state = np.zeros((self.n, 2, self.grid_height, self.grid_width), dtype=np.float32)
+        state[:, 0] = self.boards
+        xs, ys = self._cells(self.kind, self.rotation, self.x, self.y)
+        state[np.arange(self.n)[:, None], 1, ys, xs] = 1.0
+        return state